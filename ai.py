@@ -0,0 +1,447 @@
+import json
+import multiprocessing
+import os
+import queue
+import time
+
+from engine import Figure, PIECE_MASKS, PIECE_BOTTOMS, PAD, skyline, drop_y, zobrist
+from transposition import TranspositionTable
+
+# Веса эвристики: суммарная высота, убранные линии, дыры, неровность
+DEFAULT_WEIGHTS = {
+    "height": -0.510066,
+    "lines": 0.760666,
+    "holes": -0.35663,
+    "bumpiness": -0.184483,
+}
+
+# Файл с весами, подобранными train.py
+WEIGHTS_FILE = "weights.json"
+
+# Веса из файла; без файла (или с неполным набором) - DEFAULT_WEIGHTS
+def load_weights(path=WEIGHTS_FILE):
+    if not os.path.exists(path):
+        return DEFAULT_WEIGHTS
+    with open(path) as f:
+        weights = json.load(f).get("weights", {})
+    if set(weights) != set(DEFAULT_WEIGHTS):
+        return DEFAULT_WEIGHTS
+    return {name: float(value) for name, value in weights.items()}
+
+# Строки поля в виде битовых масок (как в BitboardTetris)
+def board_rows(game):
+    rows = getattr(game, "rows", None)
+    if rows is not None:
+        return rows
+    full = (1 << (game.width + 2 * PAD + 1)) - 1
+    empty = full ^ (((1 << game.width) - 1) << PAD)
+    return [empty | sum(1 << (j + PAD) for j, cell in enumerate(row) if cell) for row in game.field]
+
+def collides(rows, height, masks, x, y):
+    shift = x + PAD
+    if shift < 0:
+        return True
+    for i, mask in masks:
+        r = y + i
+        if r >= height or rows[r] & (mask << shift):
+            return True
+    return False
+
+# Кладёт фигуру и убирает полные строки; возвращает новые строки и число линий
+def place(rows, masks, x, y, width):
+    full = (1 << (width + 2 * PAD + 1)) - 1
+    rows = rows[:]
+    for i, mask in masks:
+        rows[y + i] |= mask << (x + PAD)
+    kept = [row for row in rows if row != full]
+    lines = len(rows) - len(kept)
+    if lines:
+        empty = full ^ (((1 << width) - 1) << PAD)
+        rows = [empty] * lines + kept
+    return rows, lines
+
+def evaluate(rows, lines, width, weights=DEFAULT_WEIGHTS):
+    cells = ((1 << width) - 1) << PAD
+    height = len(rows)
+    heights = [0] * width
+    seen = 0
+    holes = 0
+    for y, row in enumerate(rows):
+        row &= cells
+        holes += bin(seen & ~row).count("1")
+        new = row & ~seen
+        while new:
+            low = new & -new
+            heights[low.bit_length() - 1 - PAD] = height - y
+            new ^= low
+        seen |= row
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return (weights["height"] * sum(heights) +
+            weights["lines"] * lines +
+            weights["holes"] * holes +
+            weights["bumpiness"] * bumpiness)
+
+# Все достижимые конечные положения фигуры: повороты на месте, сдвиг, сброс.
+# Возвращает (число поворотов, x, y приземления, маски фигуры, строки после, линии).
+def placements(rows, height, width, figure):
+    count = len(Figure.figures[figure.type])
+    tops = skyline(rows, width)
+    for turns in range(count):
+        rotation = (figure.rotation + turns) % count
+        masks = PIECE_MASKS[figure.type][rotation]
+        bottoms = PIECE_BOTTOMS[figure.type][rotation]
+        if collides(rows, height, masks, figure.x, figure.y):
+            break
+        xs = [figure.x]
+        for dx in (-1, 1):
+            x = figure.x + dx
+            while not collides(rows, height, masks, x, figure.y):
+                xs.append(x)
+                x += dx
+        for x in xs:
+            y = drop_y(tops, bottoms, x, figure.y)
+            if y is None:
+                y = figure.y
+                while not collides(rows, height, masks, x, y + 1):
+                    y += 1
+            after, lines = place(rows, masks, x, y, width)
+            yield turns, x, y, masks, after, lines
+
+# Кэш поиска: оценки полей (без слагаемого за линии) по хэшу поля
+# и лучшие ходы по хэшу поля с фигурой. Веса меняются - кэш создаётся заново.
+class SearchCache:
+    def __init__(self, eval_bits=16, move_bits=12):
+        self.evals = TranspositionTable(eval_bits)
+        self.moves = TranspositionTable(move_bits)
+
+    def stats(self):
+        return "evals: %s; moves: %s; %.1f MB" % (
+            self.evals.stats(), self.moves.stats(), (self.evals.memory() + self.moves.memory()) / 2 ** 20)
+
+def best_move(game, weights=DEFAULT_WEIGHTS, cache=None):
+    if not game.figure:
+        return None
+    if cache is not None:
+        key = game.zobrist_hash()
+        move = cache.moves.get(key, 1)
+        if move is not None:
+            return move
+        keys = zobrist(game.height, game.width)
+        board = game.board_hash
+    rows = board_rows(game)
+    best = None
+    best_score = None
+    for turns, x, y, masks, after, lines in placements(rows, game.height, game.width, game.figure):
+        if cache is None:
+            score = evaluate(after, lines, game.width, weights)
+        else:
+            # Без убранных линий хэш поля обновляется XOR'ом клеток фигуры
+            h = board ^ keys.place_hash(masks, x, y) if not lines else keys.rows_hash(after)
+            score = cache.evals.get(h)
+            if score is None:
+                score = evaluate(after, 0, game.width, weights)
+                cache.evals.put(h, score)
+            score += weights["lines"] * lines
+        if best_score is None or score > best_score:
+            best, best_score = (turns, x), score
+    if cache is not None:
+        cache.moves.put(key, best, 1)
+    return best
+
+# Поиск на два хода: текущая фигура и следующая (из точки появления).
+# Сначала все ходы оцениваются на один ход, затем по убыванию этой оценки
+# досчитываются на два; при истечении deadline или cancelled() поиск
+# останавливается с лучшим ходом среди досчитанных. report(move, depth, nodes)
+# получает каждое улучшение; depth дробная: 1.5 - досчитана половина ходов.
+# Ход - (поворот, x) в абсолютных номерах поворота.
+def lookahead(rows, height, width, figure, next_type, weights, cache, deadline,
+              cancelled=lambda: False, report=lambda move, depth, nodes: None):
+    keys = zobrist(height, width)
+    board = keys.rows_hash(rows)
+    count = len(Figure.figures[figure.type])
+
+    def score_board(after, h):
+        return cached_evaluate(cache, after, h, width, weights)
+
+    nodes = 0
+    first = []
+    for turns, x, y, masks, after, lines in placements(rows, height, width, figure):
+        h = board ^ keys.place_hash(masks, x, y) if not lines else keys.rows_hash(after)
+        nodes += 1
+        first.append((score_board(after, h) + weights["lines"] * lines, (figure.rotation + turns) % count, x, after, h, lines))
+    if not first:
+        return None, 0, nodes
+    first.sort(key=lambda move: move[0], reverse=True)
+    best = first[0][1:3]
+    report(best, 1, nodes)
+
+    spawn = spawn_figure(next_type, width)
+    best_value = None
+    searched = 0
+    for score, rotation, x, after, h, lines in first:
+        if cancelled() or time.perf_counter() > deadline:
+            break
+        value = None
+        for _, x2, y2, masks2, after2, lines2 in placements(after, height, width, spawn):
+            h2 = h ^ keys.place_hash(masks2, x2, y2) if not lines2 else keys.rows_hash(after2)
+            nodes += 1
+            total = score_board(after2, h2) + weights["lines"] * (lines + lines2)
+            if value is None or total > value:
+                value = total
+        searched += 1
+        # Следующая фигура не помещается - проигрыш, такой ход хуже любого
+        if value is not None and (best_value is None or value > best_value):
+            best_value = value
+            best = (rotation, x)
+        report(best, 1 + searched / len(first), nodes)
+    return best, 1 + searched / len(first), nodes
+
+def cached_evaluate(cache, after, h, width, weights):
+    score = cache.evals.get(h)
+    if score is None:
+        score = evaluate(after, 0, width, weights)
+        cache.evals.put(h, score)
+    return score
+
+# Фигура типа kind в положении появления (как Tetris.new_figure)
+def spawn_figure(kind, width):
+    figure = Figure.__new__(Figure)
+    figure.type, figure.rotation, figure.x, figure.y = kind, 0, width // 2 - 2, 0
+    return figure
+
+# Оценка позиции, где следующей фигуре не встать
+LOSS = -1e9
+
+# Уточнение хода после поиска на два хода: третья фигура неизвестна, поэтому
+# продолжение оценивается средним по всем типам фигур лучшего их положения.
+# У каждого первого хода смотрятся beam лучших по двум ходам продолжений;
+# beam удваивается, пока поиск не отменят или продолжения не кончатся.
+# Оценки продолжений запоминаются, поэтому расширение считает только новые.
+# report(ход, beam, узлы) - после каждого полного прохода.
+def refine(rows, height, width, figure, next_type, weights, cache,
+           cancelled=lambda: False, report=lambda move, beam, nodes: None):
+    keys = zobrist(height, width)
+    board = keys.rows_hash(rows)
+    count = len(Figure.figures[figure.type])
+    bonus = weights["lines"]
+    nodes = 0
+
+    def child_hash(h, masks, x, y, lines, after):
+        return h ^ keys.place_hash(masks, x, y) if not lines else keys.rows_hash(after)
+
+    tree = []
+    second = spawn_figure(next_type, width)
+    for turns, x, y, masks, after, lines in placements(rows, height, width, figure):
+        h = child_hash(board, masks, x, y, lines, after)
+        seconds = []
+        for _, x2, y2, masks2, after2, lines2 in placements(after, height, width, second):
+            h2 = child_hash(h, masks2, x2, y2, lines2, after2)
+            nodes += 1
+            total = lines + lines2
+            seconds.append((cached_evaluate(cache, after2, h2, width, weights) + bonus * total, after2, h2, total))
+        if cancelled():
+            return
+        seconds.sort(key=lambda move: move[0], reverse=True)
+        tree.append(((figure.rotation + turns) % count, x, seconds))
+    widest = max((len(seconds) for _, _, seconds in tree), default=0)
+
+    expected = {}
+    beam = 1
+    while widest:
+        best = None
+        best_value = None
+        for rotation, x, seconds in tree:
+            value = None
+            for _, after2, h2, lines in seconds[:beam]:
+                average = expected.get((h2, lines))
+                if average is None:
+                    if cancelled():
+                        return
+                    total = 0.0
+                    for kind in range(len(Figure.figures)):
+                        best_third = LOSS
+                        for _, x3, y3, masks3, after3, lines3 in placements(after2, height, width, spawn_figure(kind, width)):
+                            h3 = child_hash(h2, masks3, x3, y3, lines3, after3)
+                            nodes += 1
+                            third = cached_evaluate(cache, after3, h3, width, weights) + bonus * (lines + lines3)
+                            if third > best_third:
+                                best_third = third
+                        total += best_third
+                    average = expected[(h2, lines)] = total / len(Figure.figures)
+                if value is None or average > value:
+                    value = average
+            if value is not None and (best_value is None or value > best_value):
+                best_value = value
+                best = (rotation, x)
+        if best is not None:
+            report(best, beam, nodes)
+        if beam >= widest:
+            return
+        beam *= 2
+
+# Фоновый поиск на два хода в отдельном процессе (не делит GIL с игровым циклом).
+# submit() отправляет позицию, если она изменилась; номер задачи в общей памяти
+# (job) меняется сразу, и прежний поиск бросается. result() забирает лучший
+# найденный к этому моменту ход без ожидания. Ответ на два хода ищется за budget
+# секунд, потом refine() уточняет его третьим ходом, пока фигура падает,
+# то есть до новой позиции.
+class LookaheadWorker:
+    def __init__(self, weights, budget=0.05):
+        self.budget = budget
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.job = multiprocessing.Value("i", 0)
+        self.process = multiprocessing.Process(
+            target=_lookahead_process, args=(weights, self.requests, self.results, self.job), daemon=True)
+        self.key = None
+        self.move = None
+        self.depth = 0.0
+        self.beam = 0
+        self.nodes = 0
+        self.nodes_per_sec = 0.0
+
+    def start(self):
+        self.process.start()
+
+    def stop(self):
+        with self.job.get_lock():
+            self.job.value += 1
+        self.requests.put(None)
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    # Позиция - поле, текущая и следующая фигура; падение фигуры её не меняет
+    def submit(self, game):
+        figure = game.figure
+        if figure is None or game.next_figure is None:
+            return
+        game.zobrist_hash()
+        key = (game.board_hash, figure.type, figure.rotation, game.next_figure.type)
+        if key == self.key:
+            return
+        self.key = key
+        with self.job.get_lock():
+            self.job.value += 1
+            job = self.job.value
+        self.move = None
+        self.depth = 0.0
+        self.beam = 0
+        rows = list(board_rows(game))
+        self.requests.put((job, rows, game.height, game.width,
+                           (figure.type, figure.rotation, figure.x, figure.y), game.next_figure.type, self.budget))
+
+    def result(self):
+        while True:
+            try:
+                job, move, depth, beam, nodes, elapsed = self.results.get_nowait()
+            except queue.Empty:
+                return self.move
+            if job == self.job.value:
+                self.move, self.depth, self.beam, self.nodes = move, depth, beam, nodes
+                self.nodes_per_sec = nodes / elapsed if elapsed else 0.0
+
+    def stats(self):
+        return "lookahead depth %.2f, beam %d, %d nodes, %.0f nodes/s" % (
+            self.depth, self.beam, self.nodes, self.nodes_per_sec)
+
+def _lookahead_process(weights, requests, results, job):
+    # Уточнение занимает процессор, пока фигура падает: игровой цикл важнее
+    if hasattr(os, "nice"):
+        os.nice(10)
+    cache = SearchCache()
+    while True:
+        request = requests.get()
+        # Из очереди берётся только последняя позиция
+        while request is not None:
+            try:
+                newer = requests.get_nowait()
+            except queue.Empty:
+                break
+            request = newer
+        if request is None:
+            return
+        number, rows, height, width, (kind, rotation, x, y), next_type, budget = request
+        if number != job.value:
+            continue
+        figure = Figure.__new__(Figure)
+        figure.type, figure.rotation, figure.x, figure.y = kind, rotation, x, y
+        cache.evals.new_generation()
+        start = time.perf_counter()
+
+        def cancelled():
+            return job.value != number
+
+        def report(move, depth, nodes):
+            results.put((number, move, depth, 0, nodes, time.perf_counter() - start))
+        move, _, searched = lookahead(rows, height, width, figure, next_type, weights, cache, start + budget,
+                                          cancelled, report)
+        if move is None or cancelled():
+            continue
+
+        def report_refined(move, beam, nodes):
+            results.put((number, move, 3.0, beam, searched + nodes, time.perf_counter() - start))
+        refine(rows, height, width, figure, next_type, weights, cache, cancelled, report_refined)
+
+# Автоигрок: выбирает лучшее положение и ставит фигуру методами Tetris
+# С lookahead=True ход ищется на два хода вперёд в LookaheadWorker (запускается
+# при первом использовании); пока результата нет, ход считается на один ход.
+class AutoPlayer:
+    def __init__(self, weights=None, delay=1 / 15, lookahead=False, budget=0.05):
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.delay = delay
+        self.timer = 0.0
+        self.cache = SearchCache()
+        self.lookahead = lookahead
+        self.budget = budget
+        self.worker = None
+
+    # Для шага симуляции: одна фигура раз в delay секунд
+    def update(self, game, dt):
+        if self.lookahead and game.state == "start":
+            if self.worker is None:
+                self.worker = LookaheadWorker(self.weights, self.budget)
+                self.worker.start()
+            self.worker.submit(game)
+        self.timer += dt
+        if self.timer >= self.delay:
+            self.timer = 0.0
+            if game.state == "start" and not game.paused:
+                self.play(game)
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
+
+    def stats(self):
+        text = "ai cache " + self.cache.stats()
+        if self.worker is not None:
+            text += "; " + self.worker.stats()
+        return text
+
+    def play(self, game):
+        if not game.figure:
+            return
+        move = None
+        if self.worker is not None:
+            self.worker.submit(game)
+            move = self.worker.result()
+        if move is not None:
+            rotation, x = move
+            turns = (rotation - game.figure.rotation) % len(Figure.figures[game.figure.type])
+        else:
+            self.cache.evals.new_generation()
+            self.cache.moves.new_generation()
+            move = best_move(game, self.weights, self.cache)
+            if move is None:
+                return
+            turns, x = move
+        for _ in range(turns):
+            game.act("rotate")
+        while game.figure.x != x:
+            old_x = game.figure.x
+            game.act("right" if x > old_x else "left")
+            if game.figure.x == old_x:
+                break
+        game.act("drop")
@@ -0,0 +1,60 @@
+import pygame
+
+# Общий менеджер ресурсов: каждое изображение, звук и шрифт загружается один раз,
+# масштабированные и затемнённые варианты кэшируются по (путь, размер).
+class Assets:
+    def __init__(self):
+        self.images = {}
+        self.variants = {}
+        self.sounds = {}
+        self.fonts = {}
+
+    def image(self, path):
+        image = self.images.get(path)
+        if image is None:
+            image = pygame.image.load(path)
+            # convert ускоряет blit, но требует уже созданного окна
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha() if path.endswith(".png") else image.convert()
+            self.images[path] = image
+        return image
+
+    def scaled(self, path, size):
+        key = (path, tuple(size), None)
+        surface = self.variants.get(key)
+        if surface is None:
+            surface = pygame.transform.scale(self.image(path), tuple(size))
+            self.variants[key] = surface
+        return surface
+
+    # Масштабированная копия, из которой вычтен цвет rgba (эффект наведения у кнопок)
+    def darkened(self, path, size, rgba):
+        key = (path, tuple(size), tuple(rgba))
+        surface = self.variants.get(key)
+        if surface is None:
+            surface = self.scaled(path, size).copy()
+            surface.fill(rgba, special_flags=pygame.BLEND_RGBA_SUB)
+            self.variants[key] = surface
+        return surface
+
+    # Освобождает варианты path других размеров; без keep_size - вместе с оригиналом
+    def release(self, path, keep_size=None):
+        keep_size = tuple(keep_size) if keep_size else None
+        for key in [key for key in self.variants if key[0] == path and key[1] != keep_size]:
+            del self.variants[key]
+        if keep_size is None:
+            self.images.pop(path, None)
+
+    def sound(self, path):
+        sound = self.sounds.get(path)
+        if sound is None:
+            sound = pygame.mixer.Sound(path)
+            self.sounds[path] = sound
+        return sound
+
+    def font(self, path, size):
+        font = self.fonts.get((path, size))
+        if font is None:
+            font = pygame.font.Font(path, size)
+            self.fonts[(path, size)] = font
+        return font
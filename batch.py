@@ -0,0 +1,159 @@
+import numpy as np
+
+from engine import Figure, FIGURE_COLORS
+
+# Действия для BatchTetris.step
+NOOP = 0
+LEFT = 1
+RIGHT = 2
+ROTATE = 3
+SOFT_DROP = 4
+HARD_DROP = 5
+
+# Клетки фигур: CELLS[тип, поворот] -> 4 пары (строка, столбец) внутри сетки 4x4.
+# Поворотов у всех типов приводится к 4, лишние повторяют существующие по модулю.
+ROTATION_COUNTS = np.array([len(r) for r in Figure.figures], dtype=np.int64)
+CELLS = np.array([[[(p // 4, p % 4) for p in rotations[r % len(rotations)]]
+                   for r in range(4)]
+                  for rotations in Figure.figures], dtype=np.int64)
+
+
+# Пакетный Тетрис: N полей в одном массиве (N, height, width), правила как у Tetris
+class BatchTetris:
+    def __init__(self, n, height=20, width=10, seed=None):
+        self.n = n
+        self.height = height
+        self.width = width
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((n, height, width), dtype=np.int8)
+        self.type = np.zeros(n, dtype=np.int64)
+        self.rotation = np.zeros(n, dtype=np.int64)
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.color = np.zeros(n, dtype=np.int8)
+        self.next_type = np.zeros(n, dtype=np.int64)
+        self.next_color = np.zeros(n, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.lines = np.zeros(n, dtype=np.int64)
+        # Итоговый счёт последней завершённой партии каждого поля
+        self.last_score = np.zeros(n, dtype=np.int64)
+        self.games_played = np.zeros(n, dtype=np.int64)
+        self.reset(np.arange(n))
+
+    def _random_next(self, idx):
+        self.next_type[idx] = self.rng.integers(0, len(Figure.figures), len(idx))
+        self.next_color[idx] = self.rng.integers(1, FIGURE_COLORS + 1, len(idx))
+
+    def reset(self, idx):
+        self.boards[idx] = 0
+        self.score[idx] = 0
+        self.lines[idx] = 0
+        self._random_next(idx)
+        self._new_figure(idx)
+
+    def _new_figure(self, idx):
+        self.type[idx] = self.next_type[idx]
+        self.color[idx] = self.next_color[idx]
+        self.rotation[idx] = 0
+        self.x[idx] = self.width // 2 - 2
+        self.y[idx] = 0
+        self._random_next(idx)
+
+    def _cells(self, idx, x, y, rotation):
+        cells = CELLS[self.type[idx], rotation]
+        return y[:, None] + cells[:, :, 0], x[:, None] + cells[:, :, 1]
+
+    # Столкновение фигур полей idx в позициях (x, y, rotation)
+    def intersects(self, idx, x, y, rotation):
+        cy, cx = self._cells(idx, x, y, rotation)
+        outside = (cx < 0) | (cx >= self.width) | (cy >= self.height)
+        occupied = self.boards[idx[:, None],
+                               np.clip(cy, 0, self.height - 1),
+                               np.clip(cx, 0, self.width - 1)] != 0
+        return (outside | occupied).any(axis=1)
+
+    def _try_move(self, idx, dx=0, rotate=False):
+        if len(idx) == 0:
+            return
+        x = self.x[idx] + dx
+        rotation = self.rotation[idx]
+        if rotate:
+            rotation = (rotation + 1) % ROTATION_COUNTS[self.type[idx]]
+        ok = ~self.intersects(idx, x, self.y[idx], rotation)
+        self.x[idx[ok]] = x[ok]
+        self.rotation[idx[ok]] = rotation[ok]
+
+    # Высота падения: для каждой клетки фигуры - первая занятая строка ниже неё
+    def _drop_distance(self, idx):
+        occupied = self.boards[idx] != 0
+        rows = np.where(occupied, np.arange(self.height)[None, :, None], self.height)
+        rows = np.concatenate([rows, np.full((len(idx), 1, self.width), self.height)], axis=1)
+        below = np.minimum.accumulate(rows[:, ::-1], axis=1)[:, ::-1]
+        cy, cx = self._cells(idx, self.x[idx], self.y[idx], self.rotation[idx])
+        landing = below[np.arange(len(idx))[:, None], cy + 1, cx]
+        return (landing - cy - 1).min(axis=1)
+
+    def _lock(self, idx):
+        if len(idx) == 0:
+            return np.zeros(0, dtype=np.int64)
+        cy, cx = self._cells(idx, self.x[idx], self.y[idx], self.rotation[idx])
+        self.boards[idx[:, None], cy, cx] = self.color[idx, None]
+        boards = self.boards[idx]
+        full = (boards != 0).all(axis=2)
+        lines = full.sum(axis=1)
+        cleared = lines > 0
+        if cleared.any():
+            sub = idx[cleared]
+            # Стабильная сортировка поднимает полные строки наверх, там они обнуляются
+            order = np.argsort(~full[cleared], axis=1, kind="stable")
+            moved = np.take_along_axis(boards[cleared], order[:, :, None], axis=1)
+            moved[np.arange(self.height)[None, :] < lines[cleared][:, None]] = 0
+            self.boards[sub] = moved
+        self.score[idx] += lines ** 2 * 10
+        self.lines[idx] += lines
+        self._new_figure(idx)
+        return lines
+
+    # Один ход для всех полей; возвращает (убранные линии, маску завершённых партий)
+    def step(self, actions):
+        actions = np.asarray(actions)
+        self._try_move(np.flatnonzero(actions == LEFT), dx=-1)
+        self._try_move(np.flatnonzero(actions == RIGHT), dx=1)
+        self._try_move(np.flatnonzero(actions == ROTATE), rotate=True)
+
+        cleared = np.zeros(self.n, dtype=np.int64)
+        lock = []
+
+        idx = np.flatnonzero(actions == SOFT_DROP)
+        if len(idx):
+            blocked = self.intersects(idx, self.x[idx], self.y[idx] + 1, self.rotation[idx])
+            self.y[idx[~blocked]] += 1
+            lock.append(idx[blocked])
+
+        idx = np.flatnonzero(actions == HARD_DROP)
+        if len(idx):
+            self.y[idx] += self._drop_distance(idx)
+            lock.append(idx)
+
+        if lock:
+            idx = np.concatenate(lock)
+            cleared[idx] = self._lock(idx)
+            over = idx[self.intersects(idx, self.x[idx], self.y[idx], self.rotation[idx])]
+        else:
+            over = np.zeros(0, dtype=np.int64)
+
+        done = np.zeros(self.n, dtype=bool)
+        if len(over):
+            done[over] = True
+            self.last_score[over] = self.score[over]
+            self.games_played[over] += 1
+            self.reset(over)
+        return cleared, done
+
+    # Поля с нарисованной текущей фигурой
+    def observation(self):
+        boards = self.boards.copy()
+        idx = np.arange(self.n)
+        cy, cx = self._cells(idx, self.x, self.y, self.rotation)
+        boards[idx[:, None], cy, cx] = self.color[:, None]
+        return boards
@@ -0,0 +1,241 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import sys
+import time
+import types
+
+from engine import Tetris, BitboardTetris
+
+# Набор бенчмарков движка, отрисовки, жестов и сохранений.
+# Запуск: python bench.py [--quick] [-k фильтр] [--baseline файл] [--save-baseline]
+# Результаты (операций в секунду и перцентили времени одной операции) пишутся в JSON;
+# при сравнении с базовым файлом замедление больше порога считается регрессией.
+# Работает без окна и камеры: pygame запускается с фиктивным видеодрайвером SDL,
+# разбор точек руки не требует cv2 и mediapipe; без pygame случаи отрисовки пропускаются.
+
+FILLS = [0.0, 0.3, 0.6]
+# Ресурсы игры и файлы по умолчанию - рядом со скриптом; пути из аргументов - от текущего каталога
+HERE = os.path.dirname(os.path.abspath(__file__))
+SEED = 12345
+
+# Поле, заполненное на долю fill снизу; в каждой строке есть дыра, полных строк нет
+def make_game(cls, fill, seed=SEED, full_rows=0):
+    rng = random.Random(seed)
+    game = cls(20, 10, seed=seed)
+    filled = int(game.height * fill)
+    for i in range(game.height - filled, game.height):
+        hole = rng.randrange(game.width)
+        game.field[i] = [0 if j == hole or rng.random() < 0.2 else rng.randint(1, 6) for j in range(game.width)]
+    for i in range(game.height - full_rows, game.height):
+        game.field[i] = [rng.randint(1, 6) for _ in range(game.width)]
+    if isinstance(game, BitboardTetris):
+        game.sync_field()
+    game.new_figure()
+    return game
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+# prepare(number) готовит состояния (не замеряется), op вызывается для каждого из них.
+# ops_per_sec - по лучшему из repeat прогонов всей пачки. Перцентили - по времени
+# каждой операции отдельно, во втором прогоне на свежих состояниях (для быстрых
+# операций в них входят накладные расходы perf_counter, около 0.1 мкс).
+def measure(prepare, op, number, repeat):
+    samples = []
+    latencies = []
+    for _ in range(repeat):
+        states = prepare(number)
+        start = time.perf_counter()
+        for state in states:
+            op(state)
+        samples.append((time.perf_counter() - start) / number)
+        for state in prepare(number):
+            start = time.perf_counter()
+            op(state)
+            latencies.append(time.perf_counter() - start)
+    best = min(samples)
+    return {
+        "ops_per_sec": 1 / best if best else float("inf"),
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p95_us": percentile(latencies, 95) * 1e6,
+        "max_us": max(latencies) * 1e6,
+        "number": number,
+        "repeat": repeat,
+    }
+
+def same(state):
+    return lambda number: [state] * number
+
+def fresh(factory):
+    return lambda number: [copy.deepcopy(factory) for _ in range(number)]
+
+def engine_cases():
+    cases = {}
+    for cls in (Tetris, BitboardTetris):
+        for fill in FILLS:
+            name = "%s/fill%d" % (cls.__name__, fill * 100)
+            game = make_game(cls, fill)
+            cases["engine/intersects/" + name] = (same(game), lambda g: g.intersects(), 2000)
+            cases["engine/go_space/" + name] = (fresh(game), lambda g: g.go_space(), 300)
+
+            def landed(game=game):
+                game = copy.deepcopy(game)
+                game.figure.y = game.ghost_y()
+                return game
+            template = landed()
+            cases["engine/freeze/" + name] = (fresh(template), lambda g: g.freeze(), 300)
+        full = make_game(cls, 0.6, full_rows=4)
+        cases["engine/break_lines/%s/4lines" % cls.__name__] = (fresh(full), lambda g: g.break_lines(), 300)
+    return cases
+
+def save_cases():
+    import savegame
+    game = make_game(BitboardTetris, 0.6)
+    data = savegame.dumps(game)
+    return {
+        "save/dumps": (same(game), savegame.dumps, 1000),
+        "save/loads": (same(data), savegame.loads, 500),
+        "save/roundtrip": (same(game), lambda g: savegame.loads(savegame.dumps(g)), 500),
+    }
+
+def render_cases():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from render import BoardRenderer, figure_surface
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((1000, 600))
+    background = pygame.transform.scale(pygame.image.load(os.path.join(HERE, "background_light.jpg")), (1000, 600)).convert()
+    font = pygame.font.Font(os.path.join(HERE, "font.ttf"), 25)
+    colors = [(255, 255, 255), (120, 37, 179), (100, 179, 179), (80, 34, 22),
+              (80, 134, 22), (180, 34, 22), (180, 34, 122)]
+    camera = pygame.Surface((320, 240))
+    game = make_game(BitboardTetris, 0.6)
+
+    def frame(renderer):
+        score = "Score: %d" % game.score
+        sprites = [("camera", None, lambda: camera, (680, 0)),
+                   ("next", (game.next_figure.type, game.next_figure.color),
+                    lambda: figure_surface(game.next_figure, colors, game.zoom), (460, 20)),
+                   ("score", score, lambda: font.render(score, True, (0, 0, 0)), (0, 0))]
+        return renderer.draw(screen, background, game, colors, (128, 128, 128), sprites)
+
+    full = BoardRenderer()
+
+    def full_frame(_):
+        full.invalidate()
+        frame(full)
+        pygame.display.flip()
+
+    incremental = BoardRenderer()
+    frame(incremental)
+
+    # Фигура сдвигается туда-обратно: типичный кадр с изменением нескольких клеток
+    def incremental_frame(_):
+        game.go_side(1 if game.figure.x < 5 else -1)
+        pygame.display.update(frame(incremental))
+
+    return {
+        "render/full_frame": (same(None), full_frame, 30),
+        "render/incremental_frame": (same(None), incremental_frame, 100),
+    }
+
+# Точки рук в bench_data/landmarks.json синтетические (заданы вручную, не записаны с камеры)
+def hand_cases():
+    from vision import HandDetector
+    with open(os.path.join(HERE, "bench_data", "landmarks.json")) as f:
+        fixture = json.load(f)
+    width, height = fixture["frame_size"]
+    img = types.SimpleNamespace(shape=(height, width, 3))
+    detector = HandDetector.__new__(HandDetector)
+    detector.tipIds = [4, 8, 12, 16, 20]
+    results = []
+    for points in fixture["poses"].values():
+        hand = types.SimpleNamespace(landmark=[types.SimpleNamespace(x=x, y=y) for x, y in points])
+        results.append(types.SimpleNamespace(multi_hand_landmarks=[hand]))
+
+    def find_position(result):
+        detector.results = result
+        detector.findPosition(img, draw=False)
+
+    def fingers_up(result):
+        detector.results = result
+        detector.findPosition(img, draw=False)
+        detector.fingersUp()
+
+    return {
+        "hand/findPosition": (lambda number: [results[k % len(results)] for k in range(number)], find_position, 2000),
+        "hand/findPosition+fingersUp": (lambda number: [results[k % len(results)] for k in range(number)], fingers_up, 2000),
+    }
+
+SUITES = [engine_cases, save_cases, render_cases, hand_cases]
+
+def run(pattern="", quick=False):
+    results = {}
+    for suite in SUITES:
+        try:
+            cases = suite()
+        except ImportError as e:
+            print("skip %s: %s" % (suite.__name__, e))
+            continue
+        for name, (prepare, op, number) in cases.items():
+            if pattern not in name:
+                continue
+            repeat = 5 if quick else 20
+            number = max(1, number // 10) if quick else number
+            results[name] = measure(prepare, op, number, repeat)
+            r = results[name]
+            print("%-45s %12.0f ops/s  p50 %9.2f us  p95 %9.2f us" % (name, r["ops_per_sec"], r["p50_us"], r["p95_us"]))
+    return results
+
+# Регрессии: случаи, ставшие медленнее базовых больше чем на threshold
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, r in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        change = r["ops_per_sec"] / base["ops_per_sec"] - 1
+        flag = "REGRESSION" if change < -threshold else ""
+        print("%-45s %+7.1f%% %s" % (name, change * 100, flag))
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tetris benchmarks")
+    parser.add_argument("-k", dest="pattern", default="", help="run only cases containing this substring")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations")
+    parser.add_argument("--output", default=os.path.join(HERE, "bench_results.json"))
+    parser.add_argument("--baseline", default=os.path.join(HERE, "bench_baseline.json"))
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = run(args.pattern, args.quick)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        return 0
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import os
+import threading
+
+# Камера с отложенным запуском: vision (cv2, mediapipe) импортируется и камера
+# открывается в фоновом потоке, пока игра уже показывает меню.
+# До готовности (и если жесты выключены или камера недоступна) жестов и кадров нет.
+# Если есть файл model (gestures.py train), жесты распознаёт обученный классификатор.
+class LazyCamera:
+    def __init__(self, index=0, use_process=False, adaptive=False, frame_size=(320, 240), model=None):
+        self.index = index
+        self.use_process = use_process
+        self.adaptive = adaptive
+        self.frame_size = tuple(frame_size)
+        self.model = model
+        self.players = 1
+        self.paused = False
+        self.worker = None
+        self.error = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._open, daemon=True)
+        self._thread.start()
+
+    def _open(self):
+        try:
+            from vision import open_camera
+            make_recognizer = None
+            if self.model and os.path.exists(self.model):
+                from gestures import GestureClassifier, GestureRecognizer
+                classifier = GestureClassifier.load(self.model)
+                make_recognizer = lambda: GestureRecognizer(classifier)
+            worker = open_camera(self.index, use_process=self.use_process, adaptive=self.adaptive,
+                                 frame_size=self.frame_size, make_recognizer=make_recognizer)
+        except Exception as e:
+            self.error = e
+            print("camera disabled: %r" % (e,))
+            return
+        with self._lock:
+            if not self._stopped:
+                worker.players = self.players
+                if self.paused:
+                    worker.pause()
+                self.worker = worker
+                return
+        worker.stop()
+
+    # Число игроков с жестами: 1 или 2 (режим на двоих)
+    def set_players(self, players):
+        with self._lock:
+            self.players = players
+            if self.worker is not None:
+                self.worker.players = players
+
+    # Приостановка захвата и распознавания (меню, пауза, конец игры).
+    # Камера остаётся открытой, поэтому возобновление мгновенное.
+    def set_paused(self, paused):
+        with self._lock:
+            if paused == self.paused:
+                return
+            self.paused = paused
+            if self.worker is not None:
+                if paused:
+                    self.worker.pause()
+                else:
+                    self.worker.resume()
+
+    @property
+    def ready(self):
+        return self.worker is not None
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            worker, self.worker = self.worker, None
+        if worker is not None:
+            worker.stop()
+
+    def gestures(self):
+        worker = self.worker
+        return worker.gestures() if worker is not None else []
+
+    def latest(self):
+        worker = self.worker
+        return worker.latest() if worker is not None else (None, [])
+
+    # Число распознанных кадров: по нему видно, что в latest() новый кадр
+    @property
+    def frames_processed(self):
+        worker = self.worker
+        return worker.frames_processed if worker is not None else 0
+
+    @property
+    def capture_time(self):
+        worker = self.worker
+        return worker.capture_time if worker is not None else 0.0
+
+    @property
+    def inference_time(self):
+        worker = self.worker
+        return worker.inference_time if worker is not None else 0.0
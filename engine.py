@@ -0,0 +1,500 @@
+import random
+
+# Количество цветов фигур (палитры тем: пустая клетка + 6 цветов)
+FIGURE_COLORS = 6
+
+# Ширина битовых "стенок" по краям строки в BitboardTetris
+PAD = 3
+
+# Класс для фигур
+class Figure:
+    figures = [
+        [[1, 5, 9, 13], [4, 5, 6, 7]],              # I
+        [[4, 5, 9, 10], [2, 6, 5, 9]],             # Z
+        [[6, 7, 9, 10], [1, 5, 6, 10]],            # S
+        [[1, 2, 5, 9], [0, 4, 5, 6], [1, 5, 9, 8], [4, 5, 6, 10]],  # J
+        [[1, 2, 6, 10], [5, 6, 7, 9], [2, 6, 10, 11], [3, 5, 6, 7]], # L
+        [[1, 4, 5, 6], [1, 4, 5, 9], [4, 5, 6, 9], [1, 5, 6, 9]],    # T
+        [[1, 2, 5, 6]]                              # O
+    ]
+
+    def __init__(self, x, y, rng=random):
+        self.x = x
+        self.y = y
+        self.type = rng.randint(0, len(self.figures) - 1)
+        self.color = rng.randint(1, FIGURE_COLORS)
+        self.rotation = 0
+
+    def image(self):
+        return self.figures[self.type][self.rotation]
+
+    def rotate(self):
+        self.rotation = (self.rotation + 1) % len(self.figures[self.type])
+
+# Маски фигур: для каждого типа и поворота - непустые строки (смещение, биты столбцов)
+def build_piece_masks(figures):
+    masks = []
+    for rotations in figures:
+        per_type = []
+        for image in rotations:
+            rows = [0, 0, 0, 0]
+            for p in image:
+                rows[p // 4] |= 1 << (p % 4)
+            per_type.append(tuple((i, row) for i, row in enumerate(rows) if row))
+        masks.append(per_type)
+    return masks
+
+# Нижний профиль фигур: для каждого занятого столбца сетки 4x4 - нижняя занятая строка
+def build_piece_bottoms(figures):
+    bottoms = []
+    for rotations in figures:
+        per_type = []
+        for image in rotations:
+            lowest = {}
+            for p in image:
+                lowest[p % 4] = max(lowest.get(p % 4, 0), p // 4)
+            per_type.append(tuple(sorted(lowest.items())))
+        bottoms.append(per_type)
+    return bottoms
+
+PIECE_MASKS = build_piece_masks(Figure.figures)
+PIECE_BOTTOMS = build_piece_bottoms(Figure.figures)
+
+# Верхняя занятая строка каждого столбца (height, если столбец пуст)
+def skyline(rows, width):
+    tops = [len(rows)] * width
+    seen = 0
+    cells = ((1 << width) - 1) << PAD
+    for y, row in enumerate(rows):
+        new = row & cells & ~seen
+        while new:
+            low = new & -new
+            tops[low.bit_length() - 1 - PAD] = y
+            new ^= low
+        seen |= row & cells
+    return tops
+
+# Строка приземления по профилю фигуры и верхам столбцов.
+# None, если фигура не целиком над ними (например, задвинута под навес).
+def drop_y(tops, bottoms, x, y):
+    landing = None
+    for j, bottom in bottoms:
+        top = tops[x + j]
+        if y + bottom >= top:
+            return None
+        if landing is None or top - 1 - bottom < landing:
+            landing = top - 1 - bottom
+    return landing
+
+# Ключи Зобриста: случайные 64-битные числа для клеток поля и для типа,
+# поворота и положения фигуры. Хэш позиции - XOR ключей занятых клеток
+# (цвет не учитывается) и ключей текущей фигуры, поэтому при установке фигуры
+# он обновляется XOR'ом четырёх клеток. Ключи зависят только от размера поля.
+class Zobrist:
+    def __init__(self, height, width):
+        rng = random.Random("zobrist:%d:%d" % (height, width))
+        self.cells = [[rng.getrandbits(64) for _ in range(width)] for _ in range(height)]
+        self.pieces = [[rng.getrandbits(64) for _ in rotations] for rotations in Figure.figures]
+        self.xs = [rng.getrandbits(64) for _ in range(width + 2 * PAD)]
+        self.ys = [rng.getrandbits(64) for _ in range(height + 2 * PAD)]
+
+    # Строки field считаются строками поля начиная со start (для частичного пересчёта)
+    def field_hash(self, field, start=0):
+        h = 0
+        for keys, row in zip(self.cells[start:], field):
+            for key, cell in zip(keys, row):
+                if cell:
+                    h ^= key
+        return h
+
+    # То же для строк-масок (BitboardTetris, ai.board_rows)
+    def rows_hash(self, rows, start=0):
+        h = 0
+        cells = (1 << len(self.cells[0])) - 1
+        for keys, row in zip(self.cells[start:], rows):
+            row = row >> PAD & cells
+            while row:
+                low = row & -row
+                h ^= keys[low.bit_length() - 1]
+                row ^= low
+        return h
+
+    # XOR ключей клеток фигуры с масками masks в положении (x, y)
+    def place_hash(self, masks, x, y):
+        h = 0
+        for i, mask in masks:
+            keys = self.cells[y + i]
+            for j in range(4):
+                if mask >> j & 1:
+                    h ^= keys[x + j]
+        return h
+
+    def piece_hash(self, figure):
+        if figure is None:
+            return 0
+        return self.pieces[figure.type][figure.rotation] ^ self.xs[figure.x + PAD] ^ self.ys[figure.y + PAD]
+
+_zobrist = {}
+
+def zobrist(height, width):
+    keys = _zobrist.get((height, width))
+    if keys is None:
+        keys = _zobrist[(height, width)] = Zobrist(height, width)
+    return keys
+
+# Интервал гравитации (секунды на строку) для уровня: на 1-м уровне как
+# прежде (7 кадров при 15 fps), каждый следующий уровень быстрее на 15%
+def gravity_interval(level):
+    return max(0.02, 7 / 15 * 0.85 ** (level - 1))
+
+# Линий для перехода на следующий уровень
+LINES_PER_LEVEL = 10
+
+# Мусорные строки сопернику в режиме на двоих за 0..4 убранные линии
+GARBAGE = [0, 0, 1, 2, 4]
+# Цвет клеток мусорных строк (следующий после цветов фигур в палитре темы)
+GARBAGE_COLOR = FIGURE_COLORS + 1
+
+# Действия игрока: клавиатура, жесты и автоигрок проходят через Tetris.act,
+# поэтому партию можно записать и воспроизвести (см. replay.py)
+ACTIONS = ["left", "right", "rotate", "down", "drop", "pause"]
+
+# Класс игры Тетрис
+class Tetris:
+    # Значения по умолчанию для сохранений, сделанных до появления этих полей
+    lines = 0
+    fall_time = 0.0
+    rng = random
+    ticks = 0
+    recorder = None
+    # Хэш Зобриста поля; None - не считался (или поле заменено целиком)
+    board_hash = None
+    # Режим на двоих: строки к отправке сопернику и полученные, ещё не вставленные
+    garbage_out = 0
+    garbage_in = 0
+    garbage_received = 0
+
+    # seed задаёт последовательность фигур; None - случайная
+    def __init__(self, height, width, seed=None):
+        self.level = 1
+        self.score = 0
+        self.lines = 0
+        self.fall_time = 0.0
+        self.state = "start"
+        self.field = []
+        self.height = height
+        self.width = width
+        self.x = 100
+        self.y = 60
+        self.zoom = 20
+        self.figure = None
+        self.next_figure = None
+        self.paused = False
+        self.seed = random.randrange(2 ** 63) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.ticks = 0
+        self.recorder = None
+        self.board_hash = None
+        self.field = [[0 for _ in range(width)] for _ in range(height)]
+        self.new_next_figure()
+
+    # События для интерфейса (звук, рекорды), переопределяются в main.py
+    def on_rotate(self):
+        pass
+
+    def on_game_over(self):
+        pass
+
+    def new_figure(self):
+        if self.next_figure:
+            self.figure = self.next_figure
+            self.figure.x = self.width // 2 - 2
+            self.figure.y = 0
+        self.new_next_figure()
+        if self.intersects():
+            self.state = "gameover"
+            self.on_game_over()
+
+    def new_next_figure(self):
+        self.next_figure = Figure(0, 0, self.rng)
+
+    def intersects(self):
+        intersection = False
+        if self.figure:
+            for i in range(4):
+                for j in range(4):
+                    if i * 4 + j in self.figure.image():
+                        if (i + self.figure.y > self.height - 1 or
+                            j + self.figure.x > self.width - 1 or
+                            j + self.figure.x < 0 or
+                            self.field[i + self.figure.y][j + self.figure.x] > 0):
+                            intersection = True
+        return intersection
+
+    # Хэш обновляется только по строкам от верха поля до нижней убранной:
+    # ниже неё строки не сдвигаются. Ключи этих строк до сдвига убираются XOR'ом,
+    # после сдвига - добавляются на новых местах.
+    def break_lines(self):
+        keys = None
+        if self.board_hash is not None:
+            last = max((i for i, row in enumerate(self.field) if all(row)), default=-1)
+            if last >= 0:
+                top = next(i for i, row in enumerate(self.field) if any(row))
+                keys = zobrist(self.height, self.width)
+                self.board_hash ^= keys.field_hash(self.field[top:last + 1], top)
+        lines = 0
+        i = self.height - 1
+        while i >= 0:
+            if all(self.field[i]):
+                lines += 1
+                del self.field[i]
+                self.field.insert(0, [0 for _ in range(self.width)])
+            else:
+                i -= 1
+        if keys is not None:
+            self.board_hash ^= keys.field_hash(self.field[top:last + 1], top)
+        self.add_lines(lines)
+
+    def add_lines(self, lines):
+        self.score += lines ** 2 * 10
+        self.lines += lines
+        self.level = 1 + self.lines // LINES_PER_LEVEL
+        # Убранные линии сначала гасят полученный мусор, остаток уходит сопернику
+        sent = GARBAGE[min(lines, 4)]
+        cancelled = min(sent, self.garbage_in)
+        self.garbage_in -= cancelled
+        self.garbage_out += sent - cancelled
+
+    # Строки для соперника, накопленные с прошлого вызова
+    def take_garbage(self):
+        sent, self.garbage_out = self.garbage_out, 0
+        return sent
+
+    # Мусор вставляется снизу после установки фигуры: полные строки с одной дырой
+    # (столбец одинаковый в пачке). Вытесненные сверху блоки - проигрыш.
+    def receive_garbage(self):
+        count = min(self.garbage_in, self.height)
+        if not count:
+            return
+        hole = random.Random("garbage:%d:%d" % (self.seed, self.garbage_received)).randrange(self.width)
+        self.garbage_in -= count
+        self.garbage_received += count
+        overflow = any(any(row) for row in self.field[:count])
+        self.field = self.field[count:] + [[0 if j == hole else GARBAGE_COLOR for j in range(self.width)] for _ in range(count)]
+        self.board_hash = None
+        if overflow:
+            self.state = "gameover"
+            self.on_game_over()
+
+    def act(self, action):
+        if self.recorder is not None:
+            self.recorder.record(action)
+        if action == "pause":
+            self.paused = not self.paused
+        elif self.figure is None:
+            return
+        elif action == "left":
+            self.go_side(-1)
+        elif action == "right":
+            self.go_side(1)
+        elif action == "rotate":
+            self.rotate()
+        elif action == "down":
+            self.go_down()
+        elif action == "drop":
+            self.go_space()
+
+    # Шаг симуляции длиной dt секунд: новая фигура и гравитация по уровню
+    def update(self, dt):
+        self.ticks += 1
+        if self.paused:
+            return
+        if self.figure is None:
+            self.new_figure()
+        if self.state != "start":
+            return
+        self.fall_time += dt
+        interval = gravity_interval(self.level)
+        while self.fall_time >= interval and self.state == "start":
+            self.fall_time -= interval
+            self.go_down()
+
+    def go_space(self):
+        while not self.intersects():
+            self.figure.y += 1
+        self.figure.y -= 1
+        self.freeze()
+
+    # Строка, на которую упадёт текущая фигура (для go_space и "призрака")
+    def ghost_y(self):
+        old_y = self.figure.y
+        while not self.intersects():
+            self.figure.y += 1
+        y = self.figure.y - 1
+        self.figure.y = old_y
+        return y
+
+    def go_down(self):
+        self.figure.y += 1
+        if self.intersects():
+            self.figure.y -= 1
+            self.freeze()
+
+    def freeze(self):
+        for i in range(4):
+            for j in range(4):
+                if i * 4 + j in self.figure.image():
+                    self.field[i + self.figure.y][j + self.figure.x] = self.figure.color
+        self.update_hash()
+        self.break_lines()
+        self.receive_garbage()
+        if self.state == "start":
+            self.new_figure()
+
+    # Хэш Зобриста поля и текущей фигуры (для кэша оценок в ai.py)
+    def zobrist_hash(self):
+        keys = zobrist(self.height, self.width)
+        if self.board_hash is None:
+            self.board_hash = keys.field_hash(self.field)
+        return self.board_hash ^ keys.piece_hash(self.figure)
+
+    # Добавление клеток текущей фигуры к хэшу поля (в freeze)
+    def update_hash(self):
+        if self.board_hash is not None:
+            figure = self.figure
+            masks = PIECE_MASKS[figure.type][figure.rotation]
+            self.board_hash ^= zobrist(self.height, self.width).place_hash(masks, figure.x, figure.y)
+
+    def go_side(self, dx):
+        old_x = self.figure.x
+        self.figure.x += dx
+        if self.intersects():
+            self.figure.x = old_x
+
+    def rotate(self):
+        old_rotation = self.figure.rotation
+        self.figure.rotate()
+        if self.intersects():
+            self.figure.rotation = old_rotation
+        else:
+            self.on_rotate()
+
+    # Сохранение в двоичном формате savegame (импорт здесь: savegame сам импортирует engine)
+    def save_game(self, filename):
+        import savegame
+        savegame.save(self, filename)
+
+    def restart(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        self.__init__(20, 10)
+
+    @staticmethod
+    def load_game(filename):
+        import savegame
+        return savegame.load(filename)
+
+# Тетрис на битовых масках: каждая строка поля - целое число.
+# Слева и справа строки лежат "стенки" из единиц, поэтому выход за
+# границы поля ловится тем же AND, что и столкновение с блоками.
+# self.field (цвета) сохраняется для отрисовки и меняется только в freeze/break_lines.
+# self.skyline - верхняя занятая строка каждого столбца, по ней сброс считается сразу.
+class BitboardTetris(Tetris):
+    PAD = PAD
+
+    def __init__(self, height, width, seed=None):
+        super().__init__(height, width, seed)
+        self.full_row = (1 << (width + 2 * self.PAD + 1)) - 1
+        self.empty_row = self.full_row ^ (((1 << width) - 1) << self.PAD)
+        self.rows = [self.empty_row] * height
+        self.skyline = [height] * width
+
+    # Пересчёт битовых строк и верхов столбцов по self.field (после загрузки)
+    def sync_field(self):
+        self.rows = [self.empty_row | sum(1 << (j + self.PAD) for j, cell in enumerate(row) if cell)
+                     for row in self.field]
+        self.skyline = skyline(self.rows, self.width)
+        self.board_hash = None
+
+    def intersects(self):
+        figure = self.figure
+        if not figure:
+            return False
+        shift = figure.x + self.PAD
+        if shift < 0:
+            return True
+        rows = self.rows
+        for i, mask in PIECE_MASKS[figure.type][figure.rotation]:
+            y = figure.y + i
+            if y >= self.height or rows[y] & (mask << shift):
+                return True
+        return False
+
+    def ghost_y(self):
+        figure = self.figure
+        y = drop_y(self.skyline, PIECE_BOTTOMS[figure.type][figure.rotation], figure.x, figure.y)
+        if y is None:
+            return super().ghost_y()
+        return y
+
+    def go_space(self):
+        self.figure.y = self.ghost_y()
+        self.freeze()
+
+    def freeze(self):
+        figure = self.figure
+        shift = figure.x + self.PAD
+        tops = self.skyline
+        for i, mask in PIECE_MASKS[figure.type][figure.rotation]:
+            y = figure.y + i
+            self.rows[y] |= mask << shift
+            row = self.field[y]
+            for j in range(4):
+                if mask >> j & 1:
+                    row[figure.x + j] = figure.color
+                    if y < tops[figure.x + j]:
+                        tops[figure.x + j] = y
+        self.update_hash()
+        self.break_lines()
+        self.receive_garbage()
+        if self.state == "start":
+            self.new_figure()
+
+    def receive_garbage(self):
+        if self.garbage_in:
+            super().receive_garbage()
+            self.sync_field()
+
+    # Полные строки удаляются на месте. Верх столбца не ниже самой верхней полной
+    # строки (она заполнена целиком): если верх выше неё, он просто сдвигается
+    # на число убранных строк, а столбцы с верхом в убранной строке
+    # пересматриваются сверху вниз по новым строкам.
+    def break_lines(self):
+        full = self.full_row
+        rows = self.rows
+        top = min(self.skyline)
+        cleared = [i for i in range(top, self.height) if rows[i] == full]
+        lines = len(cleared)
+        if lines:
+            # Хэш: строки от верха поля до нижней убранной - XOR до и после сдвига
+            if self.board_hash is not None:
+                keys = zobrist(self.height, self.width)
+                self.board_hash ^= keys.rows_hash(rows[top:cleared[-1] + 1], top)
+            for i in reversed(cleared):
+                del rows[i]
+                del self.field[i]
+            rows[:0] = [self.empty_row] * lines
+            self.field[:0] = [[0 for _ in range(self.width)] for _ in range(lines)]
+            tops = self.skyline
+            first = cleared[0]
+            for j, y in enumerate(tops):
+                if y < first:
+                    tops[j] = y + lines
+                else:
+                    bit = 1 << (j + self.PAD)
+                    while y < self.height and not rows[y] & bit:
+                        y += 1
+                    tops[j] = y
+            if self.board_hash is not None:
+                self.board_hash ^= keys.rows_hash(rows[top:cleared[-1] + 1], top)
+        self.add_lines(lines)
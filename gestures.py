@@ -0,0 +1,233 @@
+import argparse
+import os
+import sys
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from vision import GestureLimiter
+
+# Обучаемое распознавание жестов по точкам руки (lmList из HandDetector).
+#   python gestures.py record left --seconds 20   - запись примеров жеста в набор данных
+#   python gestures.py train                      - обучение классификатора, gesture_model.npz
+# Набор данных - файл записей фиксированного размера, только дописывается
+# и читается через np.memmap. Классификатор - MLP с одним скрытым слоем на NumPy.
+# Если gesture_model.npz есть, игра распознаёт жесты им (см. camera.py).
+
+LABELS = ["none", "left", "right", "rotate", "drop"]
+POINTS = 21
+DATASET_FILE = "gestures.dat"
+MODEL_FILE = "gesture_model.npz"
+# Файлы по умолчанию в командах - рядом со скриптом (модель читает игра); пути из аргументов - от текущего каталога
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Запись: сеанс записи, номер кадра в сеансе, время, метка и точки руки в пикселях
+RECORD = np.dtype([("session", "<u4"), ("frame", "<u4"), ("time", "<f8"),
+                   ("label", "u1"), ("points", "<f4", (POINTS, 2))])
+
+def landmarks(lmList):
+    return np.array([(x, y) for _, x, y in lmList], dtype=np.float32)
+
+# Признаки: точки относительно запястья, масштаб - наибольшее отклонение (не зависят от положения и размера руки)
+def features(points):
+    centered = points - points[..., :1, :]
+    scale = np.abs(centered).max(axis=(-2, -1), keepdims=True)
+    return (centered / np.maximum(scale, 1e-6)).reshape(points.shape[:-2] + (POINTS * 2,))
+
+# Дописывает записи в конец файла; незавершённая запись в конце (обрыв) при чтении отбрасывается
+class DatasetRecorder:
+    def __init__(self, path=DATASET_FILE):
+        self.file = open(path, "ab")
+        self.session = int(time.time())
+        self.frame = 0
+        self.record_buffer = np.zeros(1, dtype=RECORD)
+
+    def record(self, lmList, label):
+        record = self.record_buffer[0]
+        record["session"] = self.session
+        record["frame"] = self.frame
+        record["time"] = time.time()
+        record["label"] = LABELS.index(label)
+        record["points"] = landmarks(lmList)
+        self.file.write(self.record_buffer.tobytes())
+        self.frame += 1
+
+    def close(self):
+        self.file.close()
+
+def load_dataset(path=DATASET_FILE):
+    count = os.path.getsize(path) // RECORD.itemsize if os.path.exists(path) else 0
+    if not count:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+# MLP: признаки -> скрытый слой (ReLU) -> вероятности меток
+class GestureClassifier:
+    def __init__(self, w1, b1, w2, b2, labels=LABELS):
+        self.w1, self.b1, self.w2, self.b2 = w1, b1, w2, b2
+        self.labels = list(labels)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        data = np.load(path)
+        return cls(data["w1"], data["b1"], data["w2"], data["b2"], [str(label) for label in data["labels"]])
+
+    def save(self, path=MODEL_FILE):
+        np.savez(path, w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2, labels=np.array(self.labels))
+
+    def probabilities(self, x):
+        hidden = np.maximum(x @ self.w1 + self.b1, 0)
+        logits = hidden @ self.w2 + self.b2
+        logits -= logits.max(axis=-1, keepdims=True)
+        p = np.exp(logits)
+        return p / p.sum(axis=-1, keepdims=True)
+
+    # Метка и её вероятность для одного кадра
+    def predict(self, lmList):
+        p = self.probabilities(features(landmarks(lmList)))
+        index = int(p.argmax())
+        return self.labels[index], float(p[index])
+
+# Обучение полным батчем (Adam, кросс-энтропия с L2)
+def train(x, y, hidden=32, epochs=500, rate=0.01, l2=1e-4, seed=0):
+    rng = np.random.default_rng(seed)
+    n, d = x.shape
+    k = len(LABELS)
+    params = [rng.normal(0, np.sqrt(2 / d), (d, hidden)).astype(np.float32), np.zeros(hidden, np.float32),
+              rng.normal(0, np.sqrt(2 / hidden), (hidden, k)).astype(np.float32), np.zeros(k, np.float32)]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in params]
+    target = np.eye(k, dtype=np.float32)[y]
+    model = GestureClassifier(*params)
+    for step in range(1, epochs + 1):
+        w1, b1, w2, b2 = params
+        hidden_out = np.maximum(x @ w1 + b1, 0)
+        p = model.probabilities(x)
+        grad_logits = (p - target) / n
+        grad_hidden = grad_logits @ w2.T * (hidden_out > 0)
+        grads = [x.T @ grad_hidden + l2 * w1, grad_hidden.sum(0), hidden_out.T @ grad_logits + l2 * w2, grad_logits.sum(0)]
+        for param, grad, (m, v) in zip(params, grads, moments):
+            m *= 0.9
+            m += 0.1 * grad
+            v *= 0.999
+            v += 0.001 * grad * grad
+            param -= rate * (m / (1 - 0.9 ** step)) / (np.sqrt(v / (1 - 0.999 ** step)) + 1e-8)
+    return model
+
+# Сглаживание по окну последних кадров: жест меняется, только если за него
+# не меньше agree кадров из window (неуверенные предсказания считаются "none").
+# Дальше GestureLimiter превращает его в события: новый жест сразу, удерживаемый
+# сдвиг повторяется раз в interval секунд, поворот и сброс - один раз.
+class GestureRecognizer:
+    def __init__(self, classifier, window=5, agree=3, threshold=0.6, interval=0.15):
+        self.classifier = classifier
+        self.window = deque(maxlen=window)
+        self.agree = agree
+        self.threshold = threshold
+        self.stable = None
+        self.limiter = GestureLimiter(interval, once=("rotate", "drop"))
+
+    def update(self, lmList, fingers, now):
+        label = "none"
+        if lmList:
+            label, confidence = self.classifier.predict(lmList)
+            if confidence < self.threshold:
+                label = "none"
+        self.window.append(label)
+        best, count = Counter(self.window).most_common(1)[0]
+        if count >= self.agree:
+            self.stable = None if best == "none" else best
+        return self.limiter.update(self.stable, now)
+
+def record_command(args):
+    from vision import open_camera
+    camera = open_camera(args.camera)
+    recorder = DatasetRecorder(args.dataset)
+    print("recording '%s' in %d s..." % (args.label, args.delay))
+    time.sleep(args.delay)
+    seen = camera.frames_processed
+    end = time.monotonic() + args.seconds
+    try:
+        while time.monotonic() < end:
+            if camera.frames_processed == seen:
+                time.sleep(0.005)
+                continue
+            seen = camera.frames_processed
+            frame, lmList = camera.latest()
+            if len(lmList) == POINTS:
+                recorder.record(lmList, args.label)
+    finally:
+        recorder.close()
+        camera.stop()
+    print("%d frames of '%s' written to %s" % (recorder.frame, args.label, args.dataset))
+    return 0
+
+# Отложенные кадры для проверки, по каждой метке отдельно. Соседние кадры одного
+# сеанса почти одинаковы, поэтому у метки с несколькими сеансами записи
+# откладываются целые сеансы (каждый пятый, но хотя бы один). Обычно на метку
+# один сеанс (один запуск record) - тогда откладывается последняя пятая часть его кадров.
+def held_out_mask(data):
+    labels = np.asarray(data["label"])
+    sessions = np.asarray(data["session"])
+    frames = np.asarray(data["frame"])
+    held_out = np.zeros(len(labels), bool)
+    for label in np.unique(labels):
+        mine = labels == label
+        label_sessions = np.unique(sessions[mine])
+        if len(label_sessions) >= 2:
+            held_out |= mine & np.isin(sessions, label_sessions[-max(1, len(label_sessions) // 5):])
+        else:
+            index = np.flatnonzero(mine)
+            count = len(index) // 5
+            if count:
+                held_out[index[np.argsort(frames[index], kind="stable")[-count:]]] = True
+    return held_out
+
+def train_command(args):
+    data = load_dataset(args.dataset)
+    if not len(data):
+        print("no data in %s" % args.dataset)
+        return 1
+    x = features(np.asarray(data["points"]))
+    y = np.asarray(data["label"], dtype=np.int64)
+    print("%d frames: %s" % (len(y), ", ".join("%s %d" % (label, (y == i).sum()) for i, label in enumerate(LABELS))))
+    held_out = held_out_mask(data)
+    for i, label in enumerate(LABELS):
+        if not (y[~held_out] == i).any():
+            print("warning: no training samples for '%s'" % label)
+    model = train(x[~held_out], y[~held_out], args.hidden, args.epochs, seed=args.seed)
+    for name, mask in (("train", ~held_out), ("held-out", held_out)):
+        if mask.any():
+            accuracy = (model.probabilities(x[mask]).argmax(axis=1) == y[mask]).mean()
+            print("%s accuracy %.1f%%" % (name, accuracy * 100))
+    # Точность оценена, сохраняется модель, обученная на всех кадрах
+    if held_out.any():
+        model = train(x, y, args.hidden, args.epochs, seed=args.seed)
+    model.save(args.output)
+    sample = [[i, int(px), int(py)] for i, (px, py) in enumerate(data["points"][0])]
+    start = time.perf_counter()
+    for _ in range(1000):
+        model.predict(sample)
+    print("saved %s, %.1f us per frame" % (args.output, (time.perf_counter() - start) * 1000))
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gesture dataset recorder and classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="record landmark frames for one gesture")
+    record.add_argument("label", choices=LABELS)
+    record.add_argument("--seconds", type=float, default=20)
+    record.add_argument("--delay", type=float, default=3, help="countdown before recording")
+    record.add_argument("--camera", type=int, default=0)
+    record.add_argument("--dataset", default=os.path.join(HERE, DATASET_FILE))
+    fit = commands.add_parser("train", help="train the classifier on the dataset")
+    fit.add_argument("--dataset", default=os.path.join(HERE, DATASET_FILE))
+    fit.add_argument("--output", default=os.path.join(HERE, MODEL_FILE))
+    fit.add_argument("--hidden", type=int, default=32)
+    fit.add_argument("--epochs", type=int, default=500)
+    fit.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    return record_command(args) if args.command == "record" else train_command(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
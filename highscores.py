@@ -0,0 +1,108 @@
+import bisect
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# Таблица рекордов в SQLite: хранится вся история партий (счёт, имя, линии,
+# длительность, способ управления). Лучшие результаты держатся в памяти
+# (top) и обновляются вставкой при каждой новой партии; запись в базу идёт
+# в фоновом потоке, чтобы конец игры не задерживал кадр.
+DB_FILE = "highscores.db"
+LEGACY_FILE = "highscores.txt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    lines INTEGER NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    input_mode TEXT NOT NULL DEFAULT 'keyboard',
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_score ON games (score DESC);
+CREATE INDEX IF NOT EXISTS games_name_score ON games (name, score DESC);
+"""
+
+INSERT = "INSERT INTO games (score, name, lines, duration, input_mode, played_at) VALUES (?, ?, ?, ?, ?, ?)"
+
+# Старый формат: "счёт,имя" в строке
+def read_legacy(path=LEGACY_FILE):
+    highscores = []
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                score, name = line.strip().split(",")
+                highscores.append((int(score), name))
+    return highscores
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+class HighscoreStore:
+    def __init__(self, path=DB_FILE, top=10, legacy_path=LEGACY_FILE):
+        self.path = path
+        self.size = top
+        self.conn = connect(path)
+        # Первый запуск: рекорды из highscores.txt переносятся в базу
+        if self.conn.execute("SELECT COUNT(*) FROM games").fetchone()[0] == 0:
+            now = time.time()
+            self.conn.executemany(INSERT, [(score, name, 0, 0.0, "keyboard", now)
+                                           for score, name in read_legacy(legacy_path)])
+            self.conn.commit()
+        self.top_games = self.conn.execute(
+            "SELECT score, name FROM games ORDER BY score DESC, id LIMIT ?", (top,)).fetchall()
+        # Ключи для bisect: top_games по убыванию счёта, при равенстве старые выше
+        self._keys = [-score for score, name in self.top_games]
+        self._writes = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def _write_loop(self):
+        conn = connect(self.path)
+        while True:
+            row = self._writes.get()
+            if row is None:
+                break
+            conn.execute(INSERT, row)
+            conn.commit()
+        conn.close()
+
+    def add(self, score, name="Player", lines=0, duration=0.0, input_mode="keyboard"):
+        index = bisect.bisect_right(self._keys, -score)
+        if index < self.size:
+            self._keys.insert(index, -score)
+            self.top_games.insert(index, (score, name))
+            del self._keys[self.size:], self.top_games[self.size:]
+        self._writes.put((score, name, lines, duration, input_mode, time.time()))
+
+    # Больше size результатов читается из базы (без ещё не записанных партий)
+    def top(self, k=5):
+        if k <= self.size:
+            return self.top_games[:k]
+        return self.conn.execute("SELECT score, name FROM games ORDER BY score DESC, id LIMIT ?", (k,)).fetchall()
+
+    # Лучший результат каждого игрока (или одного игрока name)
+    def player_best(self, name=None):
+        if name is not None:
+            row = self.conn.execute("SELECT MAX(score) FROM games WHERE name = ?", (name,)).fetchone()
+            return row[0]
+        return self.conn.execute(
+            "SELECT name, MAX(score) AS best FROM games GROUP BY name ORDER BY best DESC").fetchall()
+
+    def history(self, limit=100):
+        return self.conn.execute(
+            "SELECT score, name, lines, duration, input_mode, played_at FROM games ORDER BY id DESC LIMIT ?",
+            (limit,)).fetchall()
+
+    # Дожидается записи всех партий
+    def close(self):
+        if self._writer.is_alive():
+            self._writes.put(None)
+            self._writer.join()
+        self.conn.close()
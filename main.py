@@ -1,13 +1,19 @@
 import pygame
-import random
-import pickle
-import cv2
-import mediapipe as mp
-import numpy as np
-import time
 import sys
 import os
 import json
+import atexit
+from engine import Tetris, BitboardTetris
+from ai import AutoPlayer, load_weights
+from camera import LazyCamera
+from highscores import HighscoreStore
+from render import BoardRenderer, TextCache, CameraPreview, figure_surface, text_block
+from assets import Assets
+from timing import FixedTimestep, KeyRepeat
+from savegame import Autosaver
+from replay import start_recording
+from versus import Versus
+from profiler import FrameProfiler, LatencyMeter
 
 # Глобальные настройки
 settings = {
@@ -15,7 +21,21 @@ settings = {
     "sound_enabled": True,
     "resolution": [1000, 600],
     "custom_resolution": False,
-    "theme": "light"
+    "theme": "light",
+    "camera_process": False,
+    "camera_adaptive": False,
+    "max_fps": 60,
+    "das_ms": 170,
+    "arr_ms": 50,
+    "soft_drop_ms": 50,
+    "autosave_interval": 30,
+    "record_replays": True,
+    "gestures": True,
+    "ai_lookahead": True,
+    "camera_size": [320, 240],
+    "preview_fps": 30,
+    "gesture_model": "gesture_model.npz",
+    "profile_csv": ""
 }
 
 # Тексты для разных языков
@@ -38,7 +58,12 @@ texts = {
         "score": "Счет: ",
         "game_over": "Вы проиграли",
         "press_esc": "Нажмите ESC",
-        "saved": "Игра сохранена!"
+        "saved": "Игра сохранена!",
+        "autoplay": "Автоигра (A)",
+        "versus": "Игра на двоих",
+        "player": "Игрок {0}: {1}",
+        "wins": "Победил игрок {0}",
+        "draw": "Ничья"
     },
     "en": {
         "new_game": "New Game",
@@ -58,7 +83,12 @@ texts = {
         "score": "Score: ",
         "game_over": "Game Over",
         "press_esc": "Press ESC",
-        "saved": "Game saved!"
+        "saved": "Game saved!",
+        "autoplay": "Autoplay (A)",
+        "versus": "Versus",
+        "player": "Player {0}: {1}",
+        "wins": "Player {0} wins",
+        "draw": "Draw"
     }
 }
 
@@ -76,6 +106,7 @@ themes = {
             (80, 134, 22),    # Зелёный
             (180, 34, 22),    # Красный
             (180, 34, 122),   # Розовый
+            (110, 110, 110),  # Мусорные строки
         ],
         "white": (0, 0, 0),
         "black": (255, 255, 255),
@@ -95,6 +126,7 @@ themes = {
             (50, 200, 50),    # Яркий зелёный
             (200, 50, 50),    # Яркий красный
             (200, 50, 150),   # Яркий розовый
+            (120, 120, 120),  # Мусорные строки
         ],
         "white": (255, 255, 255),
         "black": (0, 0, 0),
@@ -107,6 +139,15 @@ themes = {
 # Доступные разрешения
 resolutions = [(800, 600), (1000, 600), (1280, 720)]
 
+# Файл сохранения; старый формат (pickle) переносится при загрузке
+SAVE_FILE = "save.sav"
+LEGACY_SAVE_FILE = "save.pkl"
+
+def load_saved_game():
+    if not os.path.exists(SAVE_FILE) and os.path.exists(LEGACY_SAVE_FILE):
+        return Tetris.load_game(LEGACY_SAVE_FILE)
+    return Tetris.load_game(SAVE_FILE)
+
 # Функции для работы с настройками
 def load_settings():
     global settings
@@ -141,7 +182,7 @@ class TextInput:
     def draw(self, screen):
         color = self.hover_color if self.active else self.color
         pygame.draw.rect(screen, color, self.rect)
-        text_surface = self.font.render(self.text, True, WHITE)
+        text_surface = text_cache.render(self.font, self.text, WHITE)
         screen.blit(text_surface, (self.rect.x + 5, self.rect.y + 5))
 
     def handle_event(self, event):
@@ -159,191 +200,6 @@ class TextInput:
     def get_value(self):
         return int(self.text) if self.text.isdigit() else 0
 
-# Класс для распознавания рук
-class HandDetector:
-    def __init__(self, mode=False, maxHands=2, modelComplexity=1, detectionCon=0.5, trackCon=0.5):
-        self.mode = mode
-        self.maxHands = maxHands
-        self.modelComplexity = modelComplexity
-        self.detectionCon = detectionCon
-        self.trackCon = trackCon
-        self.mpHands = mp.solutions.hands
-        self.hands = self.mpHands.Hands(self.mode, self.maxHands, self.modelComplexity, self.detectionCon, self.trackCon)
-        self.mpDraw = mp.solutions.drawing_utils
-        self.tipIds = [4, 8, 12, 16, 20]
-
-    def findHands(self, img, draw=True):
-        imgRGB = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        self.results = self.hands.process(imgRGB)
-        if self.results.multi_hand_landmarks:
-            for handLms in self.results.multi_hand_landmarks:
-                if draw:
-                    self.mpDraw.draw_landmarks(img, handLms, self.mpHands.HAND_CONNECTIONS)
-        return img
-
-    def findPosition(self, img, handNo=0, draw=True):
-        xList = []
-        yList = []
-        bbox = []
-        self.lmList = []
-        if self.results.multi_hand_landmarks:
-            myHand = self.results.multi_hand_landmarks[handNo]
-            for id, lm in enumerate(myHand.landmark):
-                h, w, c = img.shape
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                xList.append(cx)
-                yList.append(cy)
-                self.lmList.append([id, cx, cy])
-                if draw:
-                    cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
-            xmin, xmax = min(xList), max(xList)
-            ymin, ymax = min(yList), max(yList)
-            bbox = xmin, ymin, xmax, ymax
-            if draw:
-                cv2.rectangle(img, (bbox[0] - 20, bbox[1] - 20), (bbox[2] + 20, bbox[3] + 20), (0, 255, 0), 2)
-        return self.lmList, bbox
-
-    def fingersUp(self):
-        fingers = []
-        if not self.lmList:
-            return [0] * 5
-        if self.lmList[self.tipIds[0]][1] < self.lmList[self.tipIds[0] - 1][1]:
-            fingers.append(1)
-        else:
-            fingers.append(0)
-        for id in range(1, 5):
-            if self.lmList[self.tipIds[id]][2] < self.lmList[self.tipIds[id] - 2][2]:
-                fingers.append(1)
-            else:
-                fingers.append(0)
-        return fingers
-
-# Класс для фигур
-class Figure:
-    figures = [
-        [[1, 5, 9, 13], [4, 5, 6, 7]],              # I
-        [[4, 5, 9, 10], [2, 6, 5, 9]],             # Z
-        [[6, 7, 9, 10], [1, 5, 6, 10]],            # S
-        [[1, 2, 5, 9], [0, 4, 5, 6], [1, 5, 9, 8], [4, 5, 6, 10]],  # J
-        [[1, 2, 6, 10], [5, 6, 7, 9], [2, 6, 10, 11], [3, 5, 6, 7]], # L
-        [[1, 4, 5, 6], [1, 4, 5, 9], [4, 5, 6, 9], [1, 5, 6, 9]],    # T
-        [[1, 2, 5, 6]]                              # O
-    ]
-
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.type = random.randint(0, len(self.figures) - 1)
-        self.color = random.randint(1, len(colors) - 1)
-        self.rotation = 0
-
-    def image(self):
-        return self.figures[self.type][self.rotation]
-
-    def rotate(self):
-        self.rotation = (self.rotation + 1) % len(self.figures[self.type])
-
-# Класс игры Тетрис
-class Tetris:
-    def __init__(self, height, width):
-        self.level = 1
-        self.score = 0
-        self.state = "start"
-        self.field = []
-        self.height = height
-        self.width = width
-        self.x = 100
-        self.y = 60
-        self.zoom = 20
-        self.figure = None
-        self.next_figure = None
-        self.paused = False
-        self.field = [[0 for _ in range(width)] for _ in range(height)]
-        self.new_next_figure()
-
-    def new_figure(self):
-        if self.next_figure:
-            self.figure = self.next_figure
-            self.figure.x = self.width // 2 - 2
-            self.figure.y = 0
-        self.new_next_figure()
-        if self.intersects():
-            self.state = "gameover"
-            if settings["sound_enabled"]:
-                game_over_sound.play()
-            save_highscore(self.score)
-
-    def new_next_figure(self):
-        self.next_figure = Figure(0, 0)
-
-    def intersects(self):
-        intersection = False
-        if self.figure:
-            for i in range(4):
-                for j in range(4):
-                    if i * 4 + j in self.figure.image():
-                        if (i + self.figure.y > self.height - 1 or
-                            j + self.figure.x > self.width - 1 or
-                            j + self.figure.x < 0 or
-                            self.field[i + self.figure.y][j + self.figure.x] > 0):
-                            intersection = True
-        return intersection
-
-    def break_lines(self):
-        lines = 0
-        for i in range(self.height - 1, -1, -1):
-            if all(self.field[i]):
-                lines += 1
-                del self.field[i]
-                self.field.insert(0, [0 for _ in range(self.width)])
-        self.score += lines ** 2 * 10
-
-    def go_space(self):
-        while not self.intersects():
-            self.figure.y += 1
-        self.figure.y -= 1
-        self.freeze()
-
-    def go_down(self):
-        self.figure.y += 1
-        if self.intersects():
-            self.figure.y -= 1
-            self.freeze()
-
-    def freeze(self):
-        for i in range(4):
-            for j in range(4):
-                if i * 4 + j in self.figure.image():
-                    self.field[i + self.figure.y][j + self.figure.x] = self.figure.color
-        self.break_lines()
-        self.new_figure()
-
-    def go_side(self, dx):
-        old_x = self.figure.x
-        self.figure.x += dx
-        if self.intersects():
-            self.figure.x = old_x
-
-    def rotate(self):
-        old_rotation = self.figure.rotation
-        self.figure.rotate()
-        if self.intersects():
-            self.figure.rotation = old_rotation
-        elif settings["sound_enabled"]:
-            rotate_sound.play()
-
-    def save_game(self, filename):
-        with open(filename, 'wb') as f:
-            pickle.dump(self, f)
-
-    def restart(self):
-        self.__init__(20, 10)
-
-    @staticmethod
-    def load_game(filename):
-        with open(filename, 'rb') as f:
-            return pickle.load(f)
-
 # Обновлённый класс кнопок с изображением
 class Button:
     def __init__(self, x, y, width, height, text, font):
@@ -351,11 +207,9 @@ class Button:
         self.text = text
         self.font = font
         self.is_hovered = False
-        # Загружаем изображение кнопки и масштабируем его под заданный размер
-        self.image = pygame.transform.scale(pygame.image.load("button.png"), (width, height))
-        # Создаём затемнённую версию для эффекта наведения
-        self.hover_image = self.image.copy()
-        self.hover_image.fill((50, 50, 50, 100), special_flags=pygame.BLEND_RGBA_SUB)
+        # Изображение кнопки под заданный размер и затемнённая версия для наведения (общие из кэша)
+        self.image = assets.scaled("button.png", (width, height))
+        self.hover_image = assets.darkened("button.png", (width, height), (50, 50, 50, 100))
 
     def draw(self, screen):
         # Отрисовываем изображение кнопки
@@ -364,30 +218,35 @@ class Button:
         else:
             screen.blit(self.image, self.rect)
         # Отрисовываем текст поверх изображения
-        text_surface = self.font.render(self.text, True, WHITE)
+        text_surface = text_cache.render(self.font, self.text, WHITE)
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
 
+    # True, если наведение изменилось и кнопку нужно перерисовать
     def check_hover(self, mouse_pos):
-        self.is_hovered = self.rect.collidepoint(mouse_pos)
-
-# Функции для рекордов
-def save_highscore(score, player_name="Player"):
-    highscores = load_highscores()
-    highscores.append((score, player_name))
-    highscores = sorted(highscores, reverse=True)[:5]
-    with open("highscores.txt", "w") as f:
-        for s, name in highscores:
-            f.write(f"{s},{name}\n")
-
-def load_highscores():
-    highscores = []
-    if os.path.exists("highscores.txt"):
-        with open("highscores.txt", "r") as f:
-            for line in f:
-                score, name = line.strip().split(",")
-                highscores.append((int(score), name))
-    return sorted(highscores, reverse=True)[:5]
+        hovered = bool(self.rect.collidepoint(mouse_pos))
+        changed = hovered != self.is_hovered
+        self.is_hovered = hovered
+        return changed
+
+# Наведение на кнопки по текущему положению мыши; True, если что-то изменилось
+def update_hover(buttons):
+    mouse_pos = pygame.mouse.get_pos()
+    changed = False
+    for button in buttons:
+        changed |= button.check_hover(mouse_pos)
+    return changed
+
+# Ожидание событий в меню и на паузе: вместо перерисовки с fps поток спит до
+# ввода (не дольше timeout мс) и просыпается сразу, как только событие пришло
+def wait_events(timeout=250):
+    event = pygame.event.wait(timeout)
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
+
+# После события, кроме движения мыши, экран меню перерисовывается
+def needs_redraw(events):
+    return any(event.type != pygame.MOUSEMOTION for event in events)
 
 # Создание кнопок меню
 def create_menu_buttons():
@@ -396,12 +255,13 @@ def create_menu_buttons():
     button_x = size[0] // 2 - button_width // 2
     lang = settings["language"]
     return [
-        Button(button_x, 200, button_width, button_height, texts[lang]["new_game"], font),
+        Button(button_x, 140, button_width, button_height, texts[lang]["new_game"], font),
+        Button(button_x, 205, button_width, button_height, texts[lang]["versus"], font),
         Button(button_x, 270, button_width, button_height, texts[lang]["load_game"], font),
-        Button(button_x, 340, button_width, button_height, texts[lang]["save_game"], font),
-        Button(button_x, 410, button_width, button_height, texts[lang]["highscores"], font),
-        Button(button_x, 480, button_width, button_height, texts[lang]["settings"], font),
-        Button(button_x, 550, button_width, button_height, texts[lang]["exit"], font),
+        Button(button_x, 335, button_width, button_height, texts[lang]["save_game"], font),
+        Button(button_x, 400, button_width, button_height, texts[lang]["highscores"], font),
+        Button(button_x, 465, button_width, button_height, texts[lang]["settings"], font),
+        Button(button_x, 530, button_width, button_height, texts[lang]["exit"], font),
     ]
 
 # Создание кнопок настроек
@@ -429,24 +289,28 @@ def settings_menu(screen):
     buttons = create_settings_buttons()
     width_input = TextInput(size[0] // 2 + 50, 480, 100, 30, font, str(settings["resolution"][0]))
     height_input = TextInput(size[0] // 2 + 50, 520, 100, 30, font, str(settings["resolution"][1]))
+    redraw = True
     while True:
-        screen.blit(background, (0, 0))
-        mouse_pos = pygame.mouse.get_pos()
         lang = settings["language"]
+        if update_hover(buttons) or redraw:
+            screen.blit(background, (0, 0))
+            for button in buttons:
+                button.draw(screen)
 
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
-
-        if settings["custom_resolution"]:
-            width_text = font.render(texts[lang]["width"], True, WHITE)
-            height_text = font.render(texts[lang]["height"], True, WHITE)
-            screen.blit(width_text, (size[0] // 2 - 150, 485))
-            screen.blit(height_text, (size[0] // 2 - 150, 525))
-            width_input.draw(screen)
-            height_input.draw(screen)
-
-        for event in pygame.event.get():
+            if settings["custom_resolution"]:
+                width_text = text_cache.render(font, texts[lang]["width"], WHITE)
+                height_text = text_cache.render(font, texts[lang]["height"], WHITE)
+                screen.blit(width_text, (size[0] // 2 - 150, 485))
+                screen.blit(height_text, (size[0] // 2 - 150, 525))
+                width_input.draw(screen)
+                height_input.draw(screen)
+
+            draw_debug_overlay(screen)
+            pygame.display.flip()
+
+        events = wait_events()
+        redraw = needs_redraw(events)
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -455,6 +319,7 @@ def settings_menu(screen):
                     if button.is_hovered:
                         if button.text.startswith(texts[lang]["language"].split(":")[0]):
                             settings["language"] = "en" if settings["language"] == "ru" else "ru"
+                            text_cache.clear()
                             save_settings()
                             buttons = create_settings_buttons()
                         elif button.text.startswith(texts[lang]["sound"].split(":")[0]):
@@ -470,7 +335,7 @@ def settings_menu(screen):
                             settings["resolution"] = resolutions[(current_idx + 1) % len(resolutions)]
                             size = settings["resolution"]
                             screen = pygame.display.set_mode(size)
-                            background = pygame.transform.scale(pygame.image.load(themes[settings["theme"]]["background"]), size)
+                            background = load_background()
                             save_settings()
                             buttons = create_settings_buttons()
                         elif button.text.startswith("[") and texts[lang]["custom_res"] in button.text:
@@ -485,7 +350,8 @@ def settings_menu(screen):
                             GRAY = themes[settings["theme"]]["gray"]
                             BUTTON_COLOR = themes[settings["theme"]]["button_color"]
                             BUTTON_HOVER_COLOR = themes[settings["theme"]]["button_hover_color"]
-                            background = pygame.transform.scale(pygame.image.load(themes[settings["theme"]]["background"]), size)
+                            background = load_background()
+                            text_cache.clear()
                             save_settings()
                             buttons = create_settings_buttons()
                         elif button.text == texts[lang]["back"]:
@@ -495,28 +361,46 @@ def settings_menu(screen):
                                     settings["resolution"] = (w, h)
                                     size = settings["resolution"]
                                     screen = pygame.display.set_mode(size)
-                                    background = pygame.transform.scale(pygame.image.load(themes[settings["theme"]]["background"]), size)
+                                    background = load_background()
                                     save_settings()
                             return
             if settings["custom_resolution"]:
                 width_input.handle_event(event)
                 height_input.handle_event(event)
 
-        pygame.display.flip()
-        clock.tick(fps)
+# Отладочная информация (F3 в игре): статистика кэша текста
+def debug_text():
+    return text_cache.stats()
+
+# Строка меняется каждый кадр, поэтому рисуется мимо кэша
+def draw_debug_overlay(screen):
+    if debug:
+        screen.blit(font.render(debug_text(), True, WHITE), (0, size[1] - 30))
+
+# Фон текущей темы под текущее разрешение; варианты других тем и размеров освобождаются
+def load_background():
+    path = themes[settings["theme"]]["background"]
+    for theme in themes.values():
+        if theme["background"] != path:
+            assets.release(theme["background"])
+    assets.release(path, keep_size=size)
+    return assets.scaled(path, size)
 
 # Главное меню
 def main_menu(screen, buttons, game=None):
+    redraw = True
     while True:
-        screen.blit(background, (0, 0))
-        mouse_pos = pygame.mouse.get_pos()
         lang = settings["language"]
-
-        for button in buttons:
-            button.check_hover(mouse_pos)
-            button.draw(screen)
-
-        for event in pygame.event.get():
+        if update_hover(buttons) or redraw:
+            screen.blit(background, (0, 0))
+            for button in buttons:
+                button.draw(screen)
+            draw_debug_overlay(screen)
+            pygame.display.flip()
+
+        events = wait_events()
+        redraw = needs_redraw(events)
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 return "quit"
@@ -525,11 +409,13 @@ def main_menu(screen, buttons, game=None):
                     if button.is_hovered:
                         if button.text == texts[lang]["new_game"]:
                             return "new_game"
+                        elif button.text == texts[lang]["versus"]:
+                            return "versus"
                         elif button.text == texts[lang]["load_game"]:
                             return "load_game"
                         elif button.text == texts[lang]["save_game"]:
                             if game:
-                                game.save_game("save.pkl")
+                                game.save_game(SAVE_FILE)
                                 print(texts[lang]["saved"])
                             return "continue"
                         elif button.text == texts[lang]["highscores"]:
@@ -540,28 +426,29 @@ def main_menu(screen, buttons, game=None):
                         elif button.text == texts[lang]["exit"]:
                             return "quit"
 
-        pygame.display.flip()
-        clock.tick(fps)
-
 # Таблица рекордов
 def show_highscores(screen):
-    highscores = load_highscores()
+    highscores = highscore_store.top(5)
     lang = settings["language"]
+    back_button = Button(size[0] // 2 - 100, 400, 200, 50, texts[lang]["back"], font)
+    redraw = True
     while True:
-        screen.blit(background, (0, 0))
-        title = font1.render(texts[lang]["highscores"], True, WHITE)
-        screen.blit(title, (size[0] // 2 - title.get_width() // 2, 50))
-
-        for i, (score, name) in enumerate(highscores):
-            text = font.render(f"{i+1}. {name}: {score}", True, WHITE)
-            screen.blit(text, (size[0] // 2 - text.get_width() // 2, 150 + i * 40))
-
-        back_button = Button(size[0] // 2 - 100, 400, 200, 50, texts[lang]["back"], font)
-        mouse_pos = pygame.mouse.get_pos()
-        back_button.check_hover(mouse_pos)
-        back_button.draw(screen)
-
-        for event in pygame.event.get():
+        if update_hover([back_button]) or redraw:
+            screen.blit(background, (0, 0))
+            title = text_cache.render(font1, texts[lang]["highscores"], WHITE)
+            screen.blit(title, (size[0] // 2 - title.get_width() // 2, 50))
+
+            for i, (score, name) in enumerate(highscores):
+                text = text_cache.render(font, f"{i+1}. {name}: {score}", WHITE)
+                screen.blit(text, (size[0] // 2 - text.get_width() // 2, 150 + i * 40))
+
+            back_button.draw(screen)
+            draw_debug_overlay(screen)
+            pygame.display.flip()
+
+        events = wait_events()
+        redraw = needs_redraw(events)
+        for event in events:
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit()
@@ -570,171 +457,379 @@ def show_highscores(screen):
             if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                 return
 
-        pygame.display.flip()
-        clock.tick(fps)
-
-# Инициализация Pygame
-pygame.init()
-pygame.mixer.init()
-load_settings()
-pygame.mixer.music.load('background_music.mp3')
-pygame.mixer.music.play(-1)
-if not settings["sound_enabled"]:
-    pygame.mixer.music.pause()
-
-# Звуковые эффекты
-rotate_sound = pygame.mixer.Sound("rotate.wav")
-game_over_sound = pygame.mixer.Sound("game_over.wav")
-
-# Установка темы
-colors = themes[settings["theme"]]["colors"]
-WHITE = themes[settings["theme"]]["white"]
-BLACK = themes[settings["theme"]]["black"]
-GRAY = themes[settings["theme"]]["gray"]
-BUTTON_COLOR = themes[settings["theme"]]["button_color"]
-BUTTON_HOVER_COLOR = themes[settings["theme"]]["button_hover_color"]
-
-size = settings["resolution"]
-screen = pygame.display.set_mode(size)
-pygame.display.set_caption("Tetris")
-
-background = pygame.transform.scale(pygame.image.load(themes[settings["theme"]]["background"]), size)
-
-# Шрифты
-font_path = "font.ttf"
-font = pygame.font.Font(font_path, 25)
-font1 = pygame.font.Font(font_path, 65)
-
-# Инициализация
-detector = HandDetector()
-done = False
-clock = pygame.time.Clock()
-fps = 15
-game = Tetris(20, 10)
-counter = 0
-cap = cv2.VideoCapture(0)
+# События движка: звук поворота, звук и запись рекорда при проигрыше
+def on_rotate(game):
+    if settings["sound_enabled"]:
+        rotate_sound.play()
+
+def on_game_over(game):
+    if settings["sound_enabled"]:
+        game_over_sound.play()
+    highscore_store.add(game.score, lines=game.lines, duration=game.ticks * timestep.dt, input_mode=input_mode())
+
+# Способ управления для таблицы рекордов
+def input_mode():
+    if versus is not None:
+        return "versus"
+    if autoplay:
+        return "autoplay"
+    return "gestures" if camera.ready else "keyboard"
+
+# Новый кадр камеры в превью (не чаще preview_fps раз в секунду); False - кадра ещё нет
+def update_preview():
+    global preview_frame, preview_time
+    img, lmList = camera.latest()
+    now = pygame.time.get_ticks() / 1000
+    if img is not None and camera.frames_processed != preview_frame and (
+            not preview_fps or now - preview_time >= 1 / preview_fps):
+        preview.update(img)
+        preview_frame = camera.frames_processed
+        preview_time = now
+    return img is not None
+
+# Главное меню; игра на двоих запускается прямо из него, после неё меню показывается снова.
+# Пока открыто меню, камера приостановлена.
+def menu(game=None):
+    camera.set_paused(True)
+    try:
+        while True:
+            result = main_menu(screen, create_menu_buttons(), game)
+            if result != "versus":
+                return result
+            camera.set_paused(False)
+            result = versus_loop()
+            camera.set_paused(True)
+            if result == "quit":
+                return "quit"
+    finally:
+        camera.set_paused(False)
 
-# Главное меню
-buttons = create_menu_buttons()
-menu_result = main_menu(screen, buttons)
-
-if menu_result == "new_game":
-    game = Tetris(20, 10)
-elif menu_result == "load_game":
-    game = Tetris.load_game("save.pkl")
-elif menu_result == "quit":
-    pygame.quit()
-    sys.exit()
-
-# Основной цикл
-while not done:
-    if not game.paused:
-        if game.figure is None:
-            game.new_figure()
-        counter += 1
-        if counter > 100000:
-            counter = 0
-        if counter % (fps // 2) == 0 and game.state == "start":
-            game.go_down()
-
-    # Обработка веб-камеры
-    success, img = cap.read()
-    if success:
-        img = detector.findHands(img, draw=True)
-        lmList, bbox = detector.findPosition(img, draw=True)
-        if len(lmList) != 0:
-            fingers = detector.fingersUp()
-            if fingers[1] == 1 and fingers[4] == 0:
-                game.go_side(-1)
-                time.sleep(0.1)
-            elif fingers[1] == 0 and fingers[4] == 1:
-                game.go_side(1)
-                time.sleep(0.1)
-            elif fingers[1] == 1 and fingers[4] == 1:
-                game.rotate()
-                time.sleep(0.1)
-
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img = np.rot90(img)
-        img = pygame.surfarray.make_surface(img)
-        img = pygame.transform.scale(img, (320, 240))
-
-    # Отрисовка
-    screen.blit(background, (0, 0))
-    if success:
-        screen.blit(img, (size[0] - 320, 0))
-
-    for i in range(game.height):
-        for j in range(game.width):
-            pygame.draw.rect(screen, GRAY, [game.x + game.zoom * j, game.y + game.zoom * i, game.zoom, game.zoom], 1)
-            if game.field[i][j] > 0:
-                pygame.draw.rect(screen, colors[game.field[i][j]],
-                                 [game.x + game.zoom * j + 1, game.y + game.zoom * i + 1, game.zoom - 2, game.zoom - 1])
-
-    if game.figure:
-        for i in range(4):
-            for j in range(4):
-                p = i * 4 + j
-                if p in game.figure.image():
-                    pygame.draw.rect(screen, colors[game.figure.color],
-                                     [game.x + game.zoom * (j + game.figure.x) + 1,
-                                      game.y + game.zoom * (i + game.figure.y) + 1,
-                                      game.zoom - 2, game.zoom - 2])
-
-    if game.next_figure:
-        for i in range(4):
-            for j in range(4):
-                p = i * 4 + j
-                if p in game.next_figure.image():
-                    pygame.draw.rect(screen, colors[game.next_figure.color],
-                                     [size[0] // 2 - 40 + game.zoom * j, 20 + game.zoom * i,
-                                      game.zoom - 2, game.zoom - 2])
+# Клавиши управления фигурой
+KEY_ACTIONS = {
+    pygame.K_LEFT: "left", pygame.K_RIGHT: "right", pygame.K_DOWN: "down",
+    pygame.K_UP: "rotate", pygame.K_SPACE: "drop",
+}
 
-    lang = settings["language"]
-    text = font.render(texts[lang]["score"] + str(game.score), True, WHITE)
-    text_game_over = font1.render(texts[lang]["game_over"], True, (255, 125, 0))
-    text_game_over1 = font1.render(texts[lang]["press_esc"], True, (255, 215, 0))
-
-    screen.blit(text, [0, 0])
-    if game.state == "gameover":
-        screen.blit(text_game_over, [20, 200])
-        screen.blit(text_game_over1, [25, 265])
-
-    pygame.display.flip()
-    clock.tick(fps)
-
-    # Обработка событий
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            done = True
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
-                game.restart()
-            elif event.key == pygame.K_p:
-                game.paused = not game.paused
-            elif event.key == pygame.K_s:
-                game.save_game("save.pkl")
-                print(texts[lang]["saved"])
-            elif event.key == pygame.K_m:
-                menu_result = main_menu(screen, create_menu_buttons(), game)
-                if menu_result == "new_game":
-                    game = Tetris(20, 10)
-                elif menu_result == "load_game":
-                    game = Tetris.load_game("save.pkl")
-                elif menu_result == "quit":
-                    done = True
-            elif event.key == pygame.K_LEFT:
-                game.go_side(-1)
-            elif event.key == pygame.K_RIGHT:
-                game.go_side(1)
-            elif event.key == pygame.K_DOWN:
-                game.go_down()
-            elif event.key == pygame.K_UP:
-                game.rotate()
-            elif event.key == pygame.K_SPACE:
-                game.go_space()
-
-# Освобождение ресурсов
-cap.release()
-cv2.destroyAllWindows()
-pygame.quit()
\ No newline at end of file
+# Автоповтор с задержками из настроек
+def key_repeat():
+    return KeyRepeat(das=settings.get("das_ms", 170) / 1000, arr=settings.get("arr_ms", 50) / 1000,
+                     soft_drop=settings.get("soft_drop_ms", 50) / 1000)
+
+# Клавиши игры на двоих: первый игрок - WASD и пробел, второй - стрелки и Enter
+VERSUS_KEYS = {
+    pygame.K_a: (0, "left"), pygame.K_d: (0, "right"), pygame.K_w: (0, "rotate"),
+    pygame.K_s: (0, "down"), pygame.K_SPACE: (0, "drop"),
+    pygame.K_LEFT: (1, "left"), pygame.K_RIGHT: (1, "right"), pygame.K_UP: (1, "rotate"),
+    pygame.K_DOWN: (1, "down"), pygame.K_RETURN: (1, "drop"),
+}
+
+# Поля рядом слева от превью камеры; клетки мельче, если не помещаются
+def versus_layout(games):
+    area = size[0] - 320
+    zoom = max(8, min(20, area // (2 * (games[0].width + 5)), (size[1] - 80) // games[0].height))
+    for k, game in enumerate(games):
+        game.zoom = zoom
+        game.x = 10 + k * area // 2
+        game.y = 60
+
+# Игра на двоих: по руке на игрока из одного прохода распознавания.
+# Возвращает "menu" (M) или "quit"; ESC начинает новую партию.
+def versus_loop():
+    global versus
+    versus = Versus()
+    versus_layout(versus.games)
+    versus_renderer = BoardRenderer()
+    repeats = [key_repeat(), key_repeat()]
+    camera.set_players(2)
+    # Время в меню не должно попасть в первый кадр
+    clock.tick()
+    try:
+        while True:
+            # Пауза или конец партии - как в основном цикле: камера остановлена, цикл ждёт ввода
+            idle = versus.games[0].paused or versus.over
+            camera.set_paused(idle)
+            if idle:
+                events = wait_events()
+                clock.tick()
+                elapsed = 0.0
+            else:
+                elapsed = clock.tick(render_fps) / 1000
+                events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    return "quit"
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        versus = Versus()
+                        versus_layout(versus.games)
+                    elif event.key == pygame.K_m:
+                        return "menu"
+                    elif event.key == pygame.K_p:
+                        versus.act(0, "pause")
+                        for repeat in repeats:
+                            repeat.reset()
+                    elif event.key in VERSUS_KEYS:
+                        player, action = VERSUS_KEYS[event.key]
+                        versus.act(player, repeats[player].press(action))
+                if event.type == pygame.KEYUP and event.key in VERSUS_KEYS:
+                    player, action = VERSUS_KEYS[event.key]
+                    repeats[player].release(action)
+
+            for _ in range(timestep.advance(elapsed)):
+                for player, game in enumerate(versus.games):
+                    if not game.paused and game.state == "start":
+                        for action in repeats[player].update(timestep.dt):
+                            versus.act(player, action)
+                versus.update(timestep.dt)
+            for player, gesture in camera.gestures():
+                versus.act(player, gesture)
+            success = update_preview()
+
+            lang = settings["language"]
+            sprites = []
+            if success:
+                sprites.append(("camera", preview.version, lambda: preview.surface, (size[0] - 320, 0)))
+            for k, game in enumerate(versus.games):
+                player_text = texts[lang]["player"].format(k + 1, game.score)
+                sprites.append(("score%d" % k, (player_text, WHITE),
+                                lambda text=player_text: text_cache.render(font, text, WHITE), (game.x, 20)))
+                nf = game.next_figure
+                if nf:
+                    sprites.append(("next%d" % k, (nf.type, nf.rotation, colors[nf.color], game.zoom),
+                                    lambda nf=nf, game=game: figure_surface(nf, colors, game.zoom),
+                                    (game.x + game.width * game.zoom + 5, game.y)))
+            if versus.over:
+                winner = versus.winner
+                result = texts[lang]["draw"] if winner is None else texts[lang]["wins"].format(winner + 1)
+                sprites.append(("result", (result, lang), lambda: text_cache.render(font1, result, (255, 125, 0)), (20, 200)))
+                sprites.append(("press_esc", lang, lambda: text_cache.render(font1, texts[lang]["press_esc"], (255, 215, 0)), (25, 265)))
+            pygame.display.update(versus_renderer.draw(screen, background, versus.games, colors, GRAY, sprites))
+    finally:
+        versus = None
+        camera.set_players(1)
+        renderer.invalidate()
+
+# Запись партии для replay.py (каталог replays), если включено в settings.json
+def record_game(game):
+    global recorder
+    if recorder is not None:
+        recorder.close()
+    recorder = start_recording(game, timestep.dt) if settings.get("record_replays", True) else None
+
+# Запуск игры (не при импорте, в том числе в дочернем процессе камеры)
+if __name__ == "__main__":
+    # Инициализация Pygame
+    pygame.init()
+    pygame.mixer.init()
+    assets = Assets()
+    load_settings()
+    # Рекорды дописываются в базу и при выходе через sys.exit из меню
+    highscore_store = HighscoreStore()
+    atexit.register(highscore_store.close)
+    # Камера: vision импортируется и камера открывается в фоне, меню показывается сразу.
+    # Отдельный процесс и адаптивное распознавание - если включены в settings.json
+    camera = LazyCamera(0, use_process=settings.get("camera_process", False),
+                        adaptive=settings.get("camera_adaptive", False),
+                        frame_size=settings.get("camera_size", (320, 240)),
+                        model=settings.get("gesture_model", "gesture_model.npz"))
+    if settings.get("gestures", True):
+        camera.start()
+    # Игра запускается и без файла музыки
+    try:
+        pygame.mixer.music.load('background_music.mp3')
+        pygame.mixer.music.play(-1)
+        if not settings["sound_enabled"]:
+            pygame.mixer.music.pause()
+    except pygame.error as e:
+        print(e)
+
+    # Звуковые эффекты
+    rotate_sound = assets.sound("rotate.wav")
+    game_over_sound = assets.sound("game_over.wav")
+
+    Tetris.on_rotate = on_rotate
+    Tetris.on_game_over = on_game_over
+
+    # Установка темы
+    colors = themes[settings["theme"]]["colors"]
+    WHITE = themes[settings["theme"]]["white"]
+    BLACK = themes[settings["theme"]]["black"]
+    GRAY = themes[settings["theme"]]["gray"]
+    BUTTON_COLOR = themes[settings["theme"]]["button_color"]
+    BUTTON_HOVER_COLOR = themes[settings["theme"]]["button_hover_color"]
+
+    size = settings["resolution"]
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption("Tetris")
+
+    background = load_background()
+
+    # Шрифты
+    font_path = "font.ttf"
+    font = assets.font(font_path, 25)
+    font1 = assets.font(font_path, 65)
+    text_cache = TextCache()
+    debug = False
+    # Профайлер фаз кадра (F2 в игре); при "profile_csv" в settings.json буфер пишется в CSV при выходе
+    profiler = FrameProfiler(enabled=bool(settings.get("profile_csv")))
+    profile_font = assets.font(font_path, 16)
+    latency = LatencyMeter()
+    keys = key_repeat()
+
+    # Инициализация
+    done = False
+    clock = pygame.time.Clock()
+    # Частота отрисовки игры (0 - без ограничения) и шаг симуляции
+    render_fps = settings.get("max_fps", 60)
+    timestep = FixedTimestep(rate=60)
+    game = BitboardTetris(20, 10)
+    # Веса автоигрока из weights.json (train.py), если файл есть; поиск на два хода - в фоновом процессе
+    autoplayer = AutoPlayer(load_weights(), lookahead=settings.get("ai_lookahead", True))
+    autoplay = False
+    renderer = BoardRenderer()
+    # Превью камеры обновляется на месте, не чаще preview_fps раз в секунду (0 - с каждым кадром камеры)
+    preview = CameraPreview((320, 240))
+    preview_fps = settings.get("preview_fps", 30)
+    preview_frame = 0
+    preview_time = 0.0
+    versus = None
+    autosaver = Autosaver(interval=settings.get("autosave_interval", 30))
+
+    recorder = None
+
+    # Главное меню
+    menu_result = menu()
+    clock.tick()
+
+    if menu_result == "new_game":
+        game = BitboardTetris(20, 10)
+    elif menu_result == "load_game":
+        game = load_saved_game()
+    elif menu_result == "quit":
+        camera.stop()
+        pygame.quit()
+        sys.exit()
+    record_game(game)
+
+    # Основной цикл
+    while not done:
+        # Ввод читается сразу после ожидания кадра, до симуляции и отрисовки:
+        # результат нажатия показывается в этом же кадре.
+        # На паузе и после проигрыша камера остановлена, а цикл ждёт ввода
+        # вместо отрисовки с render_fps; время ожидания в симуляцию не идёт.
+        idle = game.paused or game.state == "gameover"
+        camera.set_paused(idle)
+        if idle:
+            events = wait_events()
+            clock.tick()
+            elapsed = 0.0
+        else:
+            elapsed = clock.tick(render_fps) / 1000
+            events = pygame.event.get()
+        profiler.mark("tick")
+        latency.poll(waited=idle)
+        for event in events:
+            if event.type == pygame.QUIT:
+                done = True
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    game.restart()
+                    record_game(game)
+                elif event.key == pygame.K_p:
+                    game.act("pause")
+                    keys.reset()
+                elif event.key == pygame.K_s:
+                    game.save_game(SAVE_FILE)
+                    print(texts[settings["language"]]["saved"])
+                elif event.key == pygame.K_m:
+                    menu_result = menu(game)
+                    clock.tick()
+                    renderer.invalidate()
+                    keys.reset()
+                    if menu_result == "new_game":
+                        game = BitboardTetris(20, 10)
+                        record_game(game)
+                    elif menu_result == "load_game":
+                        game = load_saved_game()
+                        record_game(game)
+                    elif menu_result == "quit":
+                        done = True
+                        break
+                elif event.key in KEY_ACTIONS:
+                    game.act(keys.press(KEY_ACTIONS[event.key]))
+                    latency.input()
+                elif event.key == pygame.K_a:
+                    autoplay = not autoplay
+                elif event.key == pygame.K_F3:
+                    debug = not debug
+                elif event.key == pygame.K_F2:
+                    profiler.toggle()
+            if event.type == pygame.KEYUP and event.key in KEY_ACTIONS:
+                keys.release(KEY_ACTIONS[event.key])
+        if done:
+            break
+        profiler.mark("events")
+
+        # Симуляция с фиксированным шагом, независимо от частоты кадров
+        for _ in range(timestep.advance(elapsed)):
+            if autoplay:
+                autoplayer.update(game, timestep.dt)
+            elif not game.paused and game.state == "start":
+                for action in keys.update(timestep.dt):
+                    game.act(action)
+            game.update(timestep.dt)
+        autosaver.update(game)
+        profiler.mark("simulation")
+
+        # Жесты и последний кадр из фонового потока камеры
+        for player, gesture in camera.gestures():
+            game.act(gesture)
+            latency.input()
+        profiler.mark("gestures")
+
+        success = update_preview()
+        profiler.mark("preview")
+
+        # Отрисовка: перерисовываются только изменившиеся клетки и спрайты
+        lang = settings["language"]
+        score_text = texts[lang]["score"] + str(game.score)
+        sprites = []
+        if success:
+            sprites.append(("camera", preview.version, lambda: preview.surface, (size[0] - 320, 0)))
+        if game.next_figure:
+            nf = game.next_figure
+            sprites.append(("next", (nf.type, nf.rotation, colors[nf.color]),
+                            lambda: figure_surface(nf, colors, game.zoom), (size[0] // 2 - 40, 20)))
+        sprites.append(("score", (score_text, WHITE), lambda: text_cache.render(font, score_text, WHITE), (0, 0)))
+        if autoplay:
+            sprites.append(("autoplay", (lang, WHITE), lambda: text_cache.render(font, texts[lang]["autoplay"], WHITE), (0, 30)))
+        if game.state == "gameover":
+            sprites.append(("game_over", lang, lambda: text_cache.render(font1, texts[lang]["game_over"], (255, 125, 0)), (20, 200)))
+            sprites.append(("press_esc", lang, lambda: text_cache.render(font1, texts[lang]["press_esc"], (255, 215, 0)), (25, 265)))
+        if debug:
+            debug_info = debug_text()
+            sprites.append(("debug", (debug_info, WHITE), lambda: font.render(debug_info, True, WHITE), (0, size[1] - 30)))
+            if autoplay:
+                ai_info = autoplayer.stats()
+                sprites.append(("ai_cache", (ai_info, WHITE), lambda: profile_font.render(ai_info, True, WHITE), (0, size[1] - 50)))
+        if profiler.enabled:
+            profile_lines = profiler.summary() + latency.summary()
+            sprites.append(("profile", (tuple(profile_lines), WHITE),
+                            lambda: text_block(profile_font, profile_lines, WHITE), (size[0] - 320, 250)))
+
+        dirty = renderer.draw(screen, background, game, colors, GRAY, sprites)
+        profiler.mark("draw")
+        pygame.display.update(dirty)
+        latency.displayed()
+        profiler.mark("flip")
+        profiler.end_frame(camera.capture_time, camera.inference_time)
+
+    # Освобождение ресурсов
+    if settings.get("profile_csv"):
+        profiler.dump_csv(settings["profile_csv"])
+    if recorder is not None:
+        recorder.close()
+    autosaver.close()
+    autoplayer.close()
+    camera.stop()
+    pygame.quit()
\ No newline at end of file
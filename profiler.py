@@ -0,0 +1,113 @@
+import time
+from array import array
+
+# Фазы кадра. capture и inference идут в потоке/процессе камеры, для них
+# записывается их собственное последнее время; остальные - время в игровом цикле.
+PHASES = ["capture", "inference", "tick", "events", "simulation", "gestures", "preview", "draw", "flip"]
+
+# p50, p95 и максимум первых count значений буфера
+def percentiles(buffer, count):
+    if not count:
+        return 0.0, 0.0, 0.0
+    values = sorted(buffer[:count])
+    return values[count // 2], values[min(count - 1, count * 95 // 100)], values[-1]
+
+# Замер фаз игрового цикла в кольцевой буфер фиксированного размера.
+# Выключенный профайлер только проверяет флаг в mark()/end_frame().
+class FrameProfiler:
+    def __init__(self, size=600, enabled=False):
+        self.size = size
+        self.enabled = enabled
+        self.times = {phase: array("d", bytes(8 * size)) for phase in PHASES}
+        self.frames = 0
+        self.last = time.perf_counter()
+        self.summary_time = 0.0
+        self.summary_lines = []
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.last = time.perf_counter()
+
+    # Конец фазы phase: время с предыдущей отметки, мс
+    def mark(self, phase):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.times[phase][self.frames % self.size] = (now - self.last) * 1000
+        self.last = now
+
+    def end_frame(self, capture=0.0, inference=0.0):
+        if not self.enabled:
+            return
+        slot = self.frames % self.size
+        self.times["capture"][slot] = capture
+        self.times["inference"][slot] = inference
+        self.frames += 1
+
+    def stats(self, phase):
+        return percentiles(self.times[phase], min(self.frames, self.size))
+
+    # Строки для экрана: p50/p95/max по фазам, пересчёт не чаще раза в interval секунд
+    def summary(self, interval=0.5):
+        now = time.perf_counter()
+        if now - self.summary_time >= interval:
+            self.summary_time = now
+            self.summary_lines = ["%-10s %6s %6s %6s" % ("ms", "p50", "p95", "max")]
+            for phase in PHASES:
+                self.summary_lines.append("%-10s %6.2f %6.2f %6.2f" % ((phase,) + self.stats(phase)))
+        return self.summary_lines
+
+    # Буфер в CSV: кадр и время каждой фазы в мс, от старых кадров к новым
+    def dump_csv(self, filename):
+        count = min(self.frames, self.size)
+        first = self.frames - count
+        with open(filename, "w") as f:
+            f.write("frame," + ",".join(PHASES) + "\n")
+            for frame in range(first, self.frames):
+                slot = frame % self.size
+                f.write("%d,%s\n" % (frame, ",".join("%.4f" % self.times[phase][slot] for phase in PHASES)))
+
+
+# Задержка ввода: от чтения нажатия из очереди событий до показа кадра с его
+# результатом (после pygame.display.update). Сколько событие ждало в очереди,
+# pygame не сообщает; верхняя граница этого ожидания - интервал между опросами.
+class LatencyMeter:
+    def __init__(self, size=200):
+        self.size = size
+        self.latency = array("d", bytes(8 * size))
+        self.wait = array("d", bytes(8 * size))
+        self.count = 0
+        self.last_poll = time.perf_counter()
+        self.poll_interval = 0.0
+        self.pending = None
+
+    # Перед чтением событий кадра; waited - события получены блокирующим
+    # ожиданием (pygame.event.wait), т.е. без задержки в очереди
+    def poll(self, waited=False):
+        now = time.perf_counter()
+        self.poll_interval = 0.0 if waited else now - self.last_poll
+        self.last_poll = now
+
+    # В этом кадре применено нажатие
+    def input(self):
+        if self.pending is None:
+            self.pending = (self.last_poll, self.poll_interval)
+
+    # Кадр показан
+    def displayed(self):
+        if self.pending is None:
+            return
+        slot = self.count % self.size
+        self.latency[slot] = (time.perf_counter() - self.pending[0]) * 1000
+        self.wait[slot] = self.pending[1] * 1000
+        self.count += 1
+        self.pending = None
+
+    def stats(self):
+        return percentiles(self.latency, min(self.count, self.size))
+
+    # Строки для панели профайлера, в тех же колонках p50/p95/max
+    def summary(self):
+        count = min(self.count, self.size)
+        return ["%-10s %6.2f %6.2f %6.2f" % (("input",) + self.stats()),
+                "%-10s %6.2f %6.2f %6.2f" % (("+queue<=",) + percentiles(self.wait, count))]
@@ -0,0 +1,221 @@
+import pygame
+from collections import OrderedDict
+
+# Отрисовка игрового экрана по "грязным" областям.
+# Фон и пустая сетка рисуются один раз на кэшированную поверхность (static).
+# Каждый кадр перерисовываются только клетки, изменившиеся с прошлого кадра
+# (по разнице строк Tetris.field и положению фигуры/призрака), и изменившиеся
+# спрайты (текст, превью камеры, следующая фигура). draw() возвращает список
+# прямоугольников для pygame.display.update. Вместо одной игры можно передать
+# список (режим на двоих): каждое поле рисуется в своих game.x, game.y, game.zoom.
+class BoardRenderer:
+    def __init__(self):
+        self.static = None
+        self.static_key = None
+        self.prev_fields = []
+        self.prev_overlays = []
+        self.sprites = {}
+
+    # Полная перерисовка на следующем кадре (после меню, смены темы и т.п.)
+    def invalidate(self):
+        self.static_key = None
+
+    def _build_static(self, screen, background, games, grid_color):
+        self.static = background.copy()
+        for game in games:
+            for i in range(game.height):
+                for j in range(game.width):
+                    pygame.draw.rect(self.static, grid_color, self.cell_rect(game, i, j), 1)
+        screen.blit(self.static, (0, 0))
+        self.prev_fields = [None] * len(games)
+        self.prev_overlays = [{} for _ in games]
+        self.sprites = {}
+
+    @staticmethod
+    def cell_rect(game, i, j):
+        return pygame.Rect(game.x + game.zoom * j, game.y + game.zoom * i, game.zoom, game.zoom)
+
+    # Клетки текущей фигуры и призрака: (i, j) -> ("p" | "g", цвет)
+    @staticmethod
+    def overlay(game):
+        cells = {}
+        figure = game.figure
+        if figure:
+            image = figure.image()
+            ghost_y = game.ghost_y()
+            for p in image:
+                cells[(p // 4 + ghost_y, p % 4 + figure.x)] = ("g", figure.color)
+            for p in image:
+                cells[(p // 4 + figure.y, p % 4 + figure.x)] = ("p", figure.color)
+        return cells
+
+    # Изменившиеся клетки поля номер k: (k, i, j)
+    def _changed_cells(self, k, game, overlay):
+        field = game.field
+        prev = self.prev_fields[k]
+        if prev is None or len(prev) != len(field):
+            changed = {(i, j) for i in range(game.height) for j in range(game.width)}
+        else:
+            changed = set()
+            for i, row in enumerate(field):
+                if row != prev[i]:
+                    changed.update((i, j) for j, (a, b) in enumerate(zip(row, prev[i])) if a != b)
+        prev_overlay = self.prev_overlays[k]
+        for cell in overlay.keys() | prev_overlay.keys():
+            if overlay.get(cell) != prev_overlay.get(cell):
+                changed.add(cell)
+        self.prev_fields[k] = [row[:] for row in field]
+        self.prev_overlays[k] = overlay
+        return {(k, i, j) for i, j in changed if 0 <= i < game.height and 0 <= j < game.width}
+
+    def _draw_cell(self, screen, game, colors, overlay, i, j):
+        rect = self.cell_rect(game, i, j)
+        screen.blit(self.static, rect, rect)
+        kind = overlay.get((i, j))
+        if kind:
+            pygame.draw.rect(screen, colors[kind[1]],
+                             [rect.x + 1, rect.y + 1, game.zoom - 2, game.zoom - 2],
+                             1 if kind[0] == "g" else 0)
+        elif game.field[i][j] > 0:
+            pygame.draw.rect(screen, colors[game.field[i][j]],
+                             [rect.x + 1, rect.y + 1, game.zoom - 2, game.zoom - 1])
+        return rect
+
+    # sprites - список (имя, ключ содержимого, фабрика поверхности, позиция).
+    # Фабрика вызывается только при смене ключа; ключ None - менять каждый кадр.
+    def draw(self, screen, background, game, colors, grid_color, sprites):
+        games = game if isinstance(game, (list, tuple)) else [game]
+        key = (id(background), screen.get_size(), grid_color,
+               tuple((g.x, g.y, g.zoom, g.height, g.width) for g in games))
+        full = key != self.static_key
+        if full:
+            self.static_key = key
+            self._build_static(screen, background, games, grid_color)
+
+        overlays = [self.overlay(g) for g in games]
+        cells = set()
+        for k, g in enumerate(games):
+            cells |= self._changed_cells(k, g, overlays[k])
+
+        current = {}
+        for name, content, factory, pos in sprites:
+            old = self.sprites.get(name)
+            if content is None or old is None or old[0] != content:
+                surface = factory()
+            else:
+                surface = old[1]
+            current[name] = (content, surface, surface.get_rect(topleft=pos))
+
+        # Спрайты с новым содержимым или местом; фон под старыми и исчезнувшими восстанавливается
+        areas = []
+        redraw = set()
+        for name, (content, surface, rect) in current.items():
+            old = self.sprites.get(name)
+            if full or old is None or content is None or old[0] != content or old[2] != rect:
+                redraw.add(name)
+                if old is not None:
+                    areas.append(old[2])
+        areas.extend(rect for name, (content, surface, rect) in self.sprites.items() if name not in current)
+
+        # Спрайты, задетые перерисовкой клеток или других спрайтов, тоже перерисовываются
+        while True:
+            covered = areas + [current[name][2] for name in redraw]
+            for rect in covered:
+                for k, g in enumerate(games):
+                    cells.update((k, i, j) for i, j in self._cells_in(g, rect))
+            touched = covered + [self.cell_rect(games[k], i, j) for k, i, j in cells]
+            extra = {name for name, (content, surface, rect) in current.items()
+                     if name not in redraw and rect.collidelist(touched) != -1}
+            if not extra:
+                break
+            redraw |= extra
+
+        for rect in covered:
+            screen.blit(self.static, rect, rect)
+        dirty = covered + [self._draw_cell(screen, games[k], colors, overlays[k], i, j) for k, i, j in cells]
+        for name, content, factory, pos in sprites:
+            if name in redraw:
+                screen.blit(current[name][1], current[name][2])
+        self.sprites = current
+
+        if full:
+            return [screen.get_rect()]
+        return dirty
+
+    @staticmethod
+    def _cells_in(game, rect):
+        j0 = max(0, (rect.left - game.x) // game.zoom)
+        j1 = min(game.width - 1, (rect.right - 1 - game.x) // game.zoom)
+        i0 = max(0, (rect.top - game.y) // game.zoom)
+        i1 = min(game.height - 1, (rect.bottom - 1 - game.y) // game.zoom)
+        return {(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)}
+
+# Поверхность с фигурой в сетке 4x4 (для превью следующей фигуры)
+def figure_surface(figure, colors, zoom):
+    surface = pygame.Surface((zoom * 4, zoom * 4), pygame.SRCALPHA)
+    for p in figure.image():
+        pygame.draw.rect(surface, colors[figure.color], [zoom * (p % 4), zoom * (p // 4), zoom - 2, zoom - 2])
+    return surface
+
+# Превью камеры: одна постоянная поверхность, обновляемая на месте из
+# RGB-кадра (h, w, 3) через отражённый транспонированный вид NumPy, без
+# промежуточных массивов. Кадр другого размера масштабируется в неё через
+# вторую постоянную поверхность. version растёт с каждым обновлением
+# (ключ спрайта для BoardRenderer).
+class CameraPreview:
+    def __init__(self, size=(320, 240)):
+        self.size = tuple(size)
+        self.surface = pygame.Surface(self.size)
+        self.frame = None
+        self.version = 0
+
+    def update(self, rgb):
+        h, w = rgb.shape[:2]
+        view = rgb[:, ::-1].swapaxes(0, 1)
+        if (w, h) == self.size:
+            pygame.surfarray.blit_array(self.surface, view)
+        else:
+            if self.frame is None or self.frame.get_size() != (w, h):
+                self.frame = pygame.Surface((w, h))
+            pygame.surfarray.blit_array(self.frame, view)
+            pygame.transform.scale(self.frame, self.size, self.surface)
+        self.version += 1
+
+# Несколько строк текста одной поверхностью (для отладочных панелей)
+def text_block(font, lines, color):
+    surfaces = [font.render(line, True, color) for line in lines]
+    block = pygame.Surface((max(s.get_width() for s in surfaces), sum(s.get_height() for s in surfaces)), pygame.SRCALPHA)
+    y = 0
+    for surface in surfaces:
+        block.blit(surface, (0, y))
+        y += surface.get_height()
+    return block
+
+# Кэш отрисованного текста: ключ (шрифт, текст, цвет, сглаживание), вытеснение LRU
+class TextCache:
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (font, text, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.maxsize:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    # Сброс при смене темы или языка
+    def clear(self):
+        self.surfaces.clear()
+
+    def stats(self):
+        return "text cache: %d hits, %d misses, %d/%d" % (self.hits, self.misses, len(self.surfaces), self.maxsize)
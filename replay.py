@@ -0,0 +1,109 @@
+import hashlib
+import os
+import struct
+import sys
+import time
+
+import savegame
+from engine import ACTIONS
+
+# Формат записи партии (версия 1):
+#   заголовок: b"TRPL", версия, шаг симуляции dt (double), длина снимка, снимок savegame
+#   события: номер тика от начала записи (u32) и код действия из ACTIONS (u8)
+#   конец: тик последнего шага, код END, счёт (u32) и хэш поля (8 байт)
+# Без конца (игра закрыта аварийно) запись воспроизводится без проверки.
+MAGIC = b"TRPL"
+VERSION = 1
+END = 255
+
+HEADER = struct.Struct("<4sBdI")
+EVENT = struct.Struct("<IB")
+FOOTER = struct.Struct("<I8s")
+
+def board_hash(game):
+    return hashlib.blake2b(bytes(cell for row in game.field for cell in row), digest_size=8).digest()
+
+# Запись партии потоком в файл: подключается к игре через game.recorder
+class Recorder:
+    def __init__(self, game, filename, dt):
+        self.game = game
+        self.filename = filename
+        self.start_ticks = game.ticks
+        self.file = open(filename, "wb")
+        snapshot = savegame.dumps(game)
+        self.file.write(HEADER.pack(MAGIC, VERSION, dt, len(snapshot)))
+        self.file.write(snapshot)
+        game.recorder = self
+
+    def record(self, action):
+        self.file.write(EVENT.pack(self.game.ticks - self.start_ticks, ACTIONS.index(action)))
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.write(EVENT.pack(self.game.ticks - self.start_ticks, END))
+        self.file.write(FOOTER.pack(self.game.score, board_hash(self.game)))
+        self.file.close()
+        if self.game.recorder is self:
+            self.game.recorder = None
+
+# Новый файл записи в каталоге directory с именем по времени начала
+def start_recording(game, dt, directory="replays"):
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, time.strftime("%Y%m%d-%H%M%S") + "-%d.trp" % (game.seed % 10000))
+    return Recorder(game, filename, dt)
+
+def read(data):
+    magic, version, dt, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a Tetris replay")
+    if version != VERSION:
+        raise ValueError("unsupported replay version %d" % version)
+    offset = HEADER.size
+    game = savegame.loads(data[offset:offset + length])
+    offset += length
+    events = []
+    footer = None
+    while offset + EVENT.size <= len(data):
+        tick, code = EVENT.unpack_from(data, offset)
+        offset += EVENT.size
+        if code == END:
+            footer = (tick,) + FOOTER.unpack_from(data, offset)
+            break
+        events.append((tick, ACTIONS[code]))
+    return game, dt, events, footer
+
+# Воспроизведение без окна и камеры, с максимальной скоростью.
+# Возвращает игру после записи и результат проверки (None, если нет конца записи).
+def replay(data):
+    game, dt, events, footer = read(data)
+    # тики событий отсчитываются от начала записи, а снимок хранит свой счётчик тиков
+    start = game.ticks
+    for tick, action in events:
+        while game.ticks - start < tick:
+            game.update(dt)
+        game.act(action)
+    if footer is None:
+        return game, None
+    last_tick, score, digest = footer
+    while game.ticks - start < last_tick:
+        game.update(dt)
+    return game, game.score == score and board_hash(game) == digest
+
+def main(paths):
+    failed = 0
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        start = time.perf_counter()
+        game, ok = replay(data)
+        elapsed = time.perf_counter() - start
+        events = len(read(data)[2])
+        status = "no footer" if ok is None else ("ok" if ok else "MISMATCH")
+        print("%s: score %d, %d ticks, %d events, %.1f ms (%.0f ticks/s) - %s" % (
+            path, game.score, game.ticks, events, elapsed * 1000, game.ticks / max(elapsed, 1e-9), status))
+        failed += ok is False
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
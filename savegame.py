@@ -0,0 +1,185 @@
+import io
+import os
+import pickle
+import queue
+import struct
+import threading
+import time
+
+from engine import Figure, Tetris, BitboardTetris
+
+# Двоичный формат сохранения (версия 2), все числа little-endian:
+#   заголовок: b"TTRS", версия, движок (0 - Tetris, 1 - BitboardTetris)
+#   состояние: высота, ширина, счёт, уровень, линии, state, paused, fall_time,
+#     seed и число тиков (для записи партии), мусор: полученный и ещё не
+#     вставленный, к отправке, всего вставленный (от него зависят дыры)
+#   текущая и следующая фигура: есть ли, тип, поворот, x, y, цвет
+#   состояние генератора фигур (Mersenne Twister: 625 слов + gauss_next)
+#   поле: по 4 бита на клетку (индекс цвета), две клетки в байте
+MAGIC = b"TTRS"
+VERSION = 2
+
+HEADER = struct.Struct("<4sBB")
+STATE = struct.Struct("<BBIHIBBdqQIII")
+FIGURE = struct.Struct("<BBBbbB")
+RNG = struct.Struct("<I625IBd")
+
+ENGINES = [Tetris, BitboardTetris]
+STATES = ["start", "gameover"]
+
+def _pack_figure(figure):
+    if figure is None:
+        return FIGURE.pack(0, 0, 0, 0, 0, 0)
+    return FIGURE.pack(1, figure.type, figure.rotation, figure.x, figure.y, figure.color)
+
+def _unpack_figure(data, offset):
+    present, type, rotation, x, y, color = FIGURE.unpack_from(data, offset)
+    if not present:
+        return None
+    figure = Figure.__new__(Figure)
+    figure.type, figure.rotation, figure.x, figure.y, figure.color = type, rotation, x, y, color
+    return figure
+
+def _pack_field(field):
+    cells = [cell for row in field for cell in row]
+    if len(cells) % 2:
+        cells.append(0)
+    return bytes(cells[k] << 4 | cells[k + 1] for k in range(0, len(cells), 2))
+
+def _unpack_field(data, height, width):
+    cells = []
+    for byte in data:
+        cells.append(byte >> 4)
+        cells.append(byte & 15)
+    return [cells[i * width:(i + 1) * width] for i in range(height)]
+
+def dumps(game):
+    engine = 1 if isinstance(game, BitboardTetris) else 0
+    rng_version, words, gauss = game.rng.getstate()
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, engine),
+        STATE.pack(game.height, game.width, game.score, game.level, game.lines,
+                   STATES.index(game.state), game.paused, game.fall_time, game.seed, game.ticks,
+                   game.garbage_in, game.garbage_out, game.garbage_received),
+        _pack_figure(game.figure),
+        _pack_figure(game.next_figure),
+        RNG.pack(rng_version, *words, gauss is not None, gauss or 0.0),
+        _pack_field(game.field),
+    ])
+
+def loads(data):
+    magic, version, engine = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a Tetris save file")
+    if version != VERSION:
+        raise ValueError("unsupported save version %d" % version)
+    if engine >= len(ENGINES):
+        raise ValueError("unknown engine %d in save file" % engine)
+    offset = HEADER.size
+    if len(data) < offset + STATE.size + 2 * FIGURE.size + RNG.size:
+        raise ValueError("truncated save file")
+    (height, width, score, level, lines, state, paused, fall_time, seed, ticks,
+     garbage_in, garbage_out, garbage_received) = STATE.unpack_from(data, offset)
+    if state >= len(STATES):
+        raise ValueError("unknown game state %d in save file" % state)
+    offset += STATE.size
+    game = ENGINES[engine](height, width, seed)
+    game.score, game.level, game.lines, game.ticks = score, level, lines, ticks
+    game.state, game.paused, game.fall_time = STATES[state], bool(paused), fall_time
+    game.garbage_in, game.garbage_out, game.garbage_received = garbage_in, garbage_out, garbage_received
+    game.figure = _unpack_figure(data, offset)
+    game.next_figure = _unpack_figure(data, offset + FIGURE.size)
+    offset += 2 * FIGURE.size
+    rng = RNG.unpack_from(data, offset)
+    game.rng.setstate((rng[0], rng[1:626], rng[627] if rng[626] else None))
+    offset += RNG.size
+    if len(data) - offset < (height * width + 1) // 2:
+        raise ValueError("truncated save file")
+    game.field = _unpack_field(data[offset:], height, width)
+    if engine == 1:
+        game.sync_field()
+    return game
+
+def save(game, filename):
+    data = dumps(game)
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, filename)
+
+# Загрузка сохранения; старые save.pkl (pickle) переносятся в новый формат
+def load(filename):
+    with open(filename, "rb") as f:
+        data = f.read()
+    if data.startswith(MAGIC):
+        return loads(data)
+    return migrate_legacy(data)
+
+# pickle открывает только классы игры, а не произвольные объекты из файла
+class LegacyUnpickler(pickle.Unpickler):
+    classes = {"Tetris": Tetris, "BitboardTetris": BitboardTetris, "Figure": Figure}
+
+    def find_class(self, module, name):
+        if module in ("__main__", "engine", "main") and name in self.classes:
+            return self.classes[name]
+        raise pickle.UnpicklingError("forbidden class %s.%s in save file" % (module, name))
+
+def migrate_legacy(data):
+    old = LegacyUnpickler(io.BytesIO(data)).load()
+    if not isinstance(old, Tetris):
+        raise ValueError("not a Tetris save file")
+    # Пересборка через новый формат: недостающие поля берут значения по умолчанию
+    game = BitboardTetris(old.height, old.width)
+    game.score, game.level, game.lines = old.score, old.level, old.lines
+    game.state, game.paused = old.state, old.paused
+    game.figure, game.next_figure = old.figure, old.next_figure
+    game.field = [row[:] for row in old.field]
+    game.sync_field()
+    return game
+
+# Периодическое автосохранение в кольцо слотов. Снимок (dumps) делается в
+# игровом потоке за микросекунды, запись на диск - в фоновом потоке.
+class Autosaver:
+    def __init__(self, prefix="autosave", slots=3, interval=30.0):
+        self.prefix = prefix
+        self.slots = slots
+        self.interval = interval
+        self.slot = 0
+        self.last_time = time.monotonic()
+        self._pending = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def path(self, slot):
+        return "%s_%d.sav" % (self.prefix, slot)
+
+    def update(self, game, now=None):
+        now = time.monotonic() if now is None else now
+        if now - self.last_time < self.interval or game.state != "start":
+            return
+        self.last_time = now
+        try:
+            self._pending.put_nowait((self.path(self.slot), dumps(game)))
+        except queue.Full:
+            return
+        self.slot = (self.slot + 1) % self.slots
+
+    def _writer(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            filename, data = item
+            tmp = filename + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, filename)
+
+    def close(self):
+        self._pending.put(None)
+        self._thread.join(timeout=2.0)
+
+    # Самый свежий слот автосохранения или None
+    def latest(self):
+        paths = [self.path(slot) for slot in range(self.slots) if os.path.exists(self.path(slot))]
+        return max(paths, key=os.path.getmtime) if paths else None
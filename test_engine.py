@@ -0,0 +1,66 @@
+import random
+
+from ai import best_move
+from engine import Tetris, BitboardTetris, skyline, zobrist
+
+ACTIONS = ["left", "right", "rotate", "down", "drop"]
+
+# Битовый движок повторяет списочный шаг в шаг: поле, фигура, счёт, состояние
+def test_bitboard_matches_list_engine():
+    for seed in range(20):
+        a = Tetris(20, 10, seed=seed)
+        b = BitboardTetris(20, 10, seed=seed)
+        a.new_figure()
+        b.new_figure()
+        rng = random.Random(seed)
+        for step in range(1000):
+            if a.state != "start":
+                break
+            action = rng.choice(ACTIONS)
+            a.act(action)
+            b.act(action)
+            a.update(1 / 60)
+            b.update(1 / 60)
+            assert a.field == b.field, (seed, step)
+            assert a.score == b.score and a.lines == b.lines and a.state == b.state, (seed, step)
+            if a.figure is not None:
+                assert (a.figure.type, a.figure.rotation, a.figure.x, a.figure.y) == \
+                       (b.figure.type, b.figure.rotation, b.figure.x, b.figure.y), (seed, step)
+                assert a.ghost_y() == b.ghost_y(), (seed, step)
+            assert b.skyline == skyline(b.rows, b.width), (seed, step)
+        assert b.state == a.state
+
+# Ходы автоигрока: партии длинные и с убранными линиями
+def test_bitboard_matches_list_engine_with_line_clears():
+    for seed in range(3):
+        a = Tetris(20, 10, seed=seed)
+        b = BitboardTetris(20, 10, seed=seed)
+        a.new_figure()
+        b.new_figure()
+        for piece in range(150):
+            turns, x = best_move(a)
+            for game in (a, b):
+                for _ in range(turns):
+                    game.act("rotate")
+                game.figure.x = x
+                game.act("drop")
+            assert a.field == b.field, (seed, piece)
+            assert a.score == b.score and a.lines == b.lines and a.state == b.state, (seed, piece)
+            assert b.skyline == skyline(b.rows, b.width), (seed, piece)
+        assert a.lines > 0
+
+# Хэш, обновляемый по ходу игры, совпадает с пересчитанным по всему полю
+def test_incremental_hash_matches_recompute():
+    keys = zobrist(20, 10)
+    for engine in (Tetris, BitboardTetris):
+        game = engine(20, 10, seed=7)
+        game.new_figure()
+        game.zobrist_hash()
+        for piece in range(150):
+            turns, x = best_move(game)
+            for _ in range(turns):
+                game.act("rotate")
+            game.figure.x = x
+            game.act("drop")
+            assert game.board_hash == keys.field_hash(game.field), (engine.__name__, piece)
+        assert game.lines > 0
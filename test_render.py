@@ -0,0 +1,17 @@
+import numpy as np
+import pygame
+
+from render import CameraPreview
+
+# Превью совпадает со старым путём rot90 + make_surface + scale и пишет в ту же поверхность
+def test_camera_preview_matches_old_path():
+    rng = np.random.default_rng(0)
+    preview = CameraPreview((320, 240))
+    surface = preview.surface
+    for w, h in [(320, 240), (640, 480)]:
+        rgb = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+        preview.update(rgb)
+        old = pygame.transform.scale(pygame.surfarray.make_surface(np.rot90(rgb)), (320, 240))
+        assert preview.surface is surface
+        assert np.array_equal(pygame.surfarray.array3d(preview.surface), pygame.surfarray.array3d(old))
+    assert preview.version == 2
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+from engine import Tetris, BitboardTetris
+from replay import start_recording, replay, FOOTER
+
+ACTIONS = ["left", "right", "rotate", "down", None, None, None, None]
+DT = 1 / 60
+
+def record(tmp_path, engine, warmup):
+    game = engine(20, 10, seed=5)
+    game.new_figure()
+    rng = random.Random(11)
+    for _ in range(warmup):
+        game.update(DT)
+    recorder = start_recording(game, DT, directory=str(tmp_path))
+    for _ in range(600):
+        if game.state != "start":
+            break
+        action = rng.choice(ACTIONS)
+        if action:
+            game.act(action)
+        game.update(DT)
+    recorder.close()
+    with open(recorder.filename, "rb") as f:
+        return game, f.read()
+
+# Запись воспроизводится в ту же игру, и хэш поля в конце совпадает
+@pytest.mark.parametrize("engine", [Tetris, BitboardTetris])
+@pytest.mark.parametrize("warmup", [0, 30])
+def test_replay_reproduces_end_hash(tmp_path, engine, warmup):
+    game, data = record(tmp_path, engine, warmup)
+    copy, ok = replay(data)
+    assert ok is True
+    assert copy.field == game.field and copy.score == game.score
+
+def test_tampered_hash_fails(tmp_path):
+    game, data = record(tmp_path, Tetris, 0)
+    data = data[:-8] + bytes(8)
+    assert replay(data)[1] is False
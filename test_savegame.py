@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from engine import Tetris, BitboardTetris
+from savegame import dumps, loads, HEADER
+
+ACTIONS = ["left", "right", "rotate", "down", None, None]
+
+def play(game, rng, steps):
+    for _ in range(steps):
+        if game.state != "start":
+            break
+        action = rng.choice(ACTIONS)
+        if action:
+            game.act(action)
+        game.update(1 / 60)
+
+def snapshot(game):
+    figures = [(f.type, f.rotation, f.x, f.y, f.color) if f else None
+               for f in (game.figure, game.next_figure)]
+    return (type(game), game.field, game.score, game.level, game.lines, game.state, game.paused,
+            game.fall_time, game.seed, game.ticks, game.garbage_in, game.garbage_out,
+            game.garbage_received, figures, game.rng.getstate())
+
+# Сохранение посреди партии загружается в ту же игру, и дальше она идёт так же
+@pytest.mark.parametrize("engine", [Tetris, BitboardTetris])
+def test_save_loads_back_to_equal_game(engine):
+    game = engine(20, 10, seed=3)
+    game.new_figure()
+    play(game, random.Random(1), 300)
+    game.garbage_in, game.garbage_out, game.garbage_received = 2, 5, 1
+    copy = loads(dumps(game))
+    assert snapshot(copy) == snapshot(game)
+    play(game, random.Random(2), 300)
+    play(copy, random.Random(2), 300)
+    assert snapshot(copy) == snapshot(game)
+
+def test_unknown_engine_is_rejected():
+    game = Tetris(20, 10, seed=3)
+    game.new_figure()
+    data = bytearray(dumps(game))
+    data[HEADER.size - 1] = 9
+    with pytest.raises(ValueError):
+        loads(bytes(data))
+    with pytest.raises(ValueError):
+        loads(dumps(game)[:40])
@@ -0,0 +1,73 @@
+# Фиксированный шаг симуляции: время кадра копится в аккумуляторе и
+# расходуется тиками длины dt, поэтому скорость игры не зависит от fps.
+# Если кадр был очень долгим (больше max_steps тиков: подвисание камеры,
+# окно перетаскивали), накопленное время отбрасывается целиком и выполняется
+# один тик, чтобы игра не "догоняла" рывком.
+class FixedTimestep:
+    def __init__(self, rate=60, max_steps=15):
+        self.dt = 1.0 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.ticks = 0
+
+    def advance(self, elapsed):
+        self.accumulator += elapsed
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            steps = 1
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.dt
+        self.ticks += steps
+        return steps
+
+# Автоповтор удерживаемых клавиш (DAS/ARR): действие выполняется сразу при
+# нажатии, повторы начинаются через das секунд и идут раз в arr секунд
+# (сброс вниз - раз в soft_drop). Время считается тиками симуляции, поэтому
+# повторы не зависят от fps и попадают в запись партии как обычные действия.
+# Повторяется последнее нажатое из удерживаемых: при зажатых влево и вправо
+# работает то, что нажато позже, после его отпускания - снова первое.
+REPEATED = ("left", "right", "down")
+
+class KeyRepeat:
+    def __init__(self, das=0.17, arr=0.05, soft_drop=0.05, max_repeat=10):
+        self.das = das
+        self.arr = arr
+        self.soft_drop = soft_drop
+        # arr = 0 - сдвиг до стенки за один тик (не больше max_repeat шагов)
+        self.max_repeat = max_repeat
+        self.held = []
+        self.wait = 0.0
+
+    def press(self, action):
+        if action in REPEATED:
+            if action in self.held:
+                self.held.remove(action)
+            self.held.append(action)
+            self.wait = self.das
+        return action
+
+    def release(self, action):
+        if action in self.held:
+            active = self.held[-1] == action
+            self.held.remove(action)
+            if active:
+                self.wait = self.das
+
+    # Клавиши могли отпустить, пока окно не получало события (меню, пауза)
+    def reset(self):
+        self.held.clear()
+
+    # Действия автоповтора за один тик длиной dt
+    def update(self, dt):
+        if not self.held:
+            return []
+        action = self.held[-1]
+        interval = self.soft_drop if action == "down" else self.arr
+        self.wait -= dt
+        actions = []
+        while self.wait <= 0 and len(actions) < self.max_repeat:
+            actions.append(action)
+            self.wait += max(interval, 0.0)
+        self.wait = max(self.wait, 0.0)
+        return actions
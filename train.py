@@ -0,0 +1,152 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from engine import BitboardTetris
+from ai import DEFAULT_WEIGHTS, WEIGHTS_FILE, best_move
+
+# Подбор весов эвристики ai.py методом перекрёстной энтропии (CEM).
+# Запуск: python train.py [--generations N] [--population N] [--resume]
+# В каждом поколении из нормального распределения (mean, std) берётся
+# population наборов весов; каждый играет одни и те же games партий
+# (общие seed на поколение, чтобы сравнение было честным) до pieces фигур.
+# Лучшая доля elite задаёт новые mean и std. Партии раздаются пулу процессов
+# по одной, поэтому загрузка ядер ровная. Seed поколений разные, и результат
+# на games партиях шумный, поэтому лучший в поколении и новое mean ещё раз
+# играют validation партий с общими для всех поколений seed; по этому счёту
+# выбирается набор для weights.json, который читает игра. После каждого
+# поколения состояние пишется в checkpoint.
+
+NAMES = sorted(DEFAULT_WEIGHTS)
+# Файлы по умолчанию - рядом со скриптом (их читает игра); пути из аргументов - от текущего каталога
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Веса задают только порядок ходов, поэтому вектор нормируется к длине 1
+def normalize(vector):
+    length = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / length for v in vector]
+
+# Одна партия без окна: число убранных линий
+def play(task):
+    index, weights, seed, pieces = task
+    game = BitboardTetris(20, 10, seed=seed)
+    game.new_figure()
+    placed = 0
+    while game.state == "start" and placed < pieces:
+        turns, x = best_move(game, weights)
+        for _ in range(turns):
+            game.figure.rotate()
+        game.figure.x = x
+        game.go_space()
+        placed += 1
+    return index, game.lines
+
+def generation_seeds(seed, generation, games):
+    rng = random.Random("train:%d:%d" % (seed, generation))
+    return [rng.randrange(2 ** 31) for _ in range(games)]
+
+def validation_seeds(seed, games):
+    rng = random.Random("validation:%d" % seed)
+    return [rng.randrange(2 ** 31) for _ in range(games)]
+
+# Среднее число линий каждого набора весов на партиях seeds
+def evaluate(pool, vectors, seeds, pieces):
+    tasks = [(i, dict(zip(NAMES, vector)), seed, pieces) for i, vector in enumerate(vectors) for seed in seeds]
+    totals = [0] * len(vectors)
+    for index, lines in pool.imap_unordered(play, tasks):
+        totals[index] += lines
+    return [total / len(seeds) for total in totals]
+
+def sample(mean, std, rng, population):
+    return [normalize([rng.gauss(m, s) for m, s in zip(mean, std)]) for _ in range(population)]
+
+def save_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+def new_state(args):
+    return {
+        "config": {"population": args.population, "games": args.games, "pieces": args.pieces,
+                   "elite": args.elite, "noise": args.noise, "seed": args.seed, "validation": args.validation},
+        "generation": 0,
+        "mean": normalize([DEFAULT_WEIGHTS[name] for name in NAMES]),
+        "std": [args.std] * len(NAMES),
+        "best": None,
+        "history": [],
+    }
+
+def run_generation(pool, state):
+    config = state["config"]
+    generation = state["generation"]
+    rng = random.Random("sample:%d:%d" % (config["seed"], generation))
+    candidates = sample(state["mean"], state["std"], rng, config["population"])
+    seeds = generation_seeds(config["seed"], generation, config["games"])
+    fitness = evaluate(pool, candidates, seeds, config["pieces"])
+
+    order = sorted(range(len(candidates)), key=lambda i: fitness[i], reverse=True)
+    elite = [candidates[i] for i in order[:max(2, int(len(candidates) * config["elite"]))]]
+    state["mean"] = [sum(v[k] for v in elite) / len(elite) for k in range(len(NAMES))]
+    state["std"] = [math.sqrt(sum((v[k] - state["mean"][k]) ** 2 for v in elite) / len(elite)) + config["noise"]
+                    for k in range(len(NAMES))]
+    top = order[0]
+    finalists = [candidates[top], normalize(state["mean"])]
+    scores = evaluate(pool, finalists, validation_seeds(config["seed"], config["validation"]), config["pieces"])
+    for vector, score in zip(finalists, scores):
+        if state["best"] is None or score > state["best"]["fitness"]:
+            state["best"] = {"weights": dict(zip(NAMES, vector)), "fitness": score, "generation": generation}
+    games = len(candidates) * len(seeds) + len(finalists) * config["validation"]
+    state["history"].append({"generation": generation, "best": fitness[top],
+                             "mean": sum(fitness) / len(fitness), "validation": max(scores), "games": games})
+    state["generation"] = generation + 1
+    return fitness[top], sum(fitness) / len(fitness), max(scores), games
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune ai.py weights with the cross-entropy method")
+    parser.add_argument("--generations", type=int, default=20)
+    parser.add_argument("--population", type=int, default=40)
+    parser.add_argument("--games", type=int, default=4, help="games per candidate")
+    parser.add_argument("--validation", type=int, default=16,
+                        help="shared games for re-scoring each generation's best and mean")
+    parser.add_argument("--pieces", type=int, default=500, help="piece limit per game")
+    parser.add_argument("--elite", type=float, default=0.25, help="fraction of candidates kept")
+    parser.add_argument("--std", type=float, default=0.5, help="initial standard deviation")
+    parser.add_argument("--noise", type=float, default=0.02, help="extra deviation against early collapse")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default=os.path.join(HERE, "train_checkpoint.json"))
+    parser.add_argument("--output", default=os.path.join(HERE, WEIGHTS_FILE))
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    args = parser.parse_args(argv)
+
+    if args.resume and os.path.exists(args.checkpoint):
+        with open(args.checkpoint) as f:
+            state = json.load(f)
+        print("resuming at generation %d" % state["generation"])
+    else:
+        state = new_state(args)
+
+    with multiprocessing.Pool(args.workers) as pool:
+        while state["generation"] < args.generations:
+            start = time.perf_counter()
+            best, mean, validation, games = run_generation(pool, state)
+            elapsed = time.perf_counter() - start
+            print("generation %d: best %.1f lines, mean %.1f, validation %.1f, %d games in %.1f s (%.1f games/s)" % (
+                state["generation"] - 1, best, mean, validation, games, elapsed, games / elapsed))
+            save_json(args.checkpoint, state)
+            save_json(args.output, state["best"])
+    if state["best"] is None:
+        print("no generations run")
+        return 1
+    print("best: %s (%.1f lines on validation games, generation %d)" % (
+        state["best"]["weights"], state["best"]["fitness"], state["best"]["generation"]))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
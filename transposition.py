@@ -0,0 +1,66 @@
+import sys
+
+# Таблица транспозиций: значения по 64-битному хэшу Зобриста позиции.
+# Фиксированное число слотов 2**bits, слот - младшие биты хэша, в слоте хранится
+# полный хэш для проверки. Запись вытесняет занятый слот, если её глубина поиска
+# не меньше или запись в слоте осталась от прошлого поколения (new_generation).
+class TranspositionTable:
+    def __init__(self, bits=16):
+        self.size = 1 << bits
+        self.mask = self.size - 1
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.used = 0
+        self.last = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.replaced = 0
+        self.rejected = 0
+
+    def get(self, key, depth=0):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key and entry[1] >= depth:
+            self.hits += 1
+            return entry[3]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth=0):
+        index = key & self.mask
+        entry = self.slots[index]
+        if entry is None:
+            self.used += 1
+        elif entry[0] != key and entry[1] > depth and entry[2] == self.generation:
+            self.rejected += 1
+            return
+        elif entry[0] != key:
+            self.replaced += 1
+        self.slots[index] = (key, depth, self.generation, value)
+        self.last = index
+        self.stores += 1
+
+    # Новый ход партии: старые записи остаются, но уступают место новым
+    def new_generation(self):
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * self.size
+        self.used = 0
+        self.last = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # Примерный объём в байтах: список слотов и занятые записи (по размеру последней)
+    def memory(self):
+        entry = self.slots[self.last] if self.used else None
+        if entry is None:
+            return sys.getsizeof(self.slots)
+        return sys.getsizeof(self.slots) + self.used * (sys.getsizeof(entry) + sum(sys.getsizeof(item) for item in entry))
+
+    def stats(self):
+        return "%d/%d slots, hit rate %.1f%%, %d replaced, %d rejected" % (
+            self.used, self.size, self.hit_rate * 100, self.replaced, self.rejected)
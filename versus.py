@@ -0,0 +1,44 @@
+from engine import BitboardTetris
+
+# Игра на двоих: два поля с одинаковой последовательностью фигур.
+# Убранные сразу две и больше линии уходят сопернику мусорными строками
+# (engine.GARBAGE); они вставляются у него после установки следующей фигуры.
+class Versus:
+    def __init__(self, height=20, width=10, seed=None):
+        first = BitboardTetris(height, width, seed)
+        self.games = [first, BitboardTetris(height, width, first.seed)]
+
+    # После конца партии доски замирают: принимается только пауза
+    def act(self, player, action):
+        if action == "pause":
+            for game in self.games:
+                game.act("pause")
+        elif not self.over:
+            self.games[player].act(action)
+
+    def update(self, dt):
+        if self.over:
+            return
+        for game in self.games:
+            game.update(dt)
+        self.exchange()
+
+    # Обмен мусором после хода обоих игроков, чтобы порядок обновления не давал преимущества
+    def exchange(self):
+        sent = [game.take_garbage() for game in self.games]
+        self.games[0].garbage_in += sent[1]
+        self.games[1].garbage_in += sent[0]
+
+    @property
+    def over(self):
+        return any(game.state == "gameover" for game in self.games)
+
+    # Номер победителя; None - игра идёт или оба проиграли на одном шаге
+    @property
+    def winner(self):
+        lost = [game.state == "gameover" for game in self.games]
+        if lost == [True, False]:
+            return 1
+        if lost == [False, True]:
+            return 0
+        return None
@@ -0,0 +1,506 @@
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+import queue
+import threading
+import time
+
+# Без cv2 и mediapipe модуль всё равно импортируется: разбор точек руки
+# (findPosition(draw=False), fingersUp, assign_players) в них не нуждается,
+# на этом работает bench.py. Камера и распознавание тогда недоступны.
+try:
+    import cv2
+    import mediapipe as mp
+except ImportError as e:
+    cv2 = mp = None
+    missing_dependency = e
+
+# Класс для распознавания рук.
+# В адаптивном режиме (adaptive=True) распознавание идёт по области вокруг
+# последнего положения рук (roiPad - запас в долях размера рамки), уменьшенной
+# до inferenceSize по большей стороне. Если рамка сдвинулась меньше чем на
+# stableThreshold пикселей, до maxSkip кадров подряд используются прежние точки.
+# Потеряв руки в области, детектор сразу повторяет поиск по всему кадру.
+# Кадр переводится в RGB один раз, в буфер self.rgb (переиспользуется между
+# кадрами, его можно подменить, например слотом общей памяти); по нему идёт
+# распознавание, на нём рисуются точки, он же служит превью.
+class HandDetector:
+    def __init__(self, mode=False, maxHands=2, modelComplexity=1, detectionCon=0.5, trackCon=0.5,
+                 adaptive=False, inferenceSize=256, roiPad=0.5, stableThreshold=4, maxSkip=2):
+        self.mode = mode
+        self.maxHands = maxHands
+        self.modelComplexity = modelComplexity
+        self.detectionCon = detectionCon
+        self.trackCon = trackCon
+        if mp is None:
+            raise missing_dependency
+        self.mpHands = mp.solutions.hands
+        self.hands = self.mpHands.Hands(self.mode, self.maxHands, self.modelComplexity, self.detectionCon, self.trackCon)
+        self.mpDraw = mp.solutions.drawing_utils
+        # Цвет точек задан в RGB: рисование идёт по RGB-кадру
+        self.landmarkSpec = self.mpDraw.DrawingSpec(color=(255, 0, 0), thickness=2, circle_radius=2)
+        self.rgb = None
+        self.tipIds = [4, 8, 12, 16, 20]
+        self.adaptive = adaptive
+        self.inferenceSize = inferenceSize
+        self.roiPad = roiPad
+        self.stableThreshold = stableThreshold
+        self.maxSkip = maxSkip
+        self.roi = None
+        self.lastBox = None
+        self.motion = float("inf")
+        self.skipped = 0
+        # Время последнего распознавания (мс) и счётчики для настройки
+        self.inferenceTime = 0.0
+        self.stats = {"frames": 0, "inferences": 0, "skipped": 0,
+                      "roi_hits": 0, "roi_misses": 0, "full_frame": 0}
+
+    def findHands(self, img, draw=True):
+        start = time.perf_counter()
+        self.stats["frames"] += 1
+        if self.rgb is None or self.rgb.shape != img.shape:
+            self.rgb = np.empty_like(img)
+        cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        if self.adaptive:
+            self._processAdaptive(img)
+        else:
+            self.results = self.hands.process(self.rgb)
+            self.stats["inferences"] += 1
+            self.stats["full_frame"] += 1
+        self.inferenceTime = (time.perf_counter() - start) * 1000
+        if self.results.multi_hand_landmarks:
+            for handLms in self.results.multi_hand_landmarks:
+                if draw:
+                    self.mpDraw.draw_landmarks(self.rgb, handLms, self.mpHands.HAND_CONNECTIONS, self.landmarkSpec)
+        return img
+
+    def _processAdaptive(self, img):
+        h, w = img.shape[:2]
+        if self.roi and self.skipped < self.maxSkip and self.motion <= self.stableThreshold:
+            self.skipped += 1
+            self.stats["skipped"] += 1
+            return
+        self.skipped = 0
+        if self.roi:
+            if self._infer(self.rgb, self.roi):
+                self.stats["roi_hits"] += 1
+                return
+            self.stats["roi_misses"] += 1
+        self._infer(self.rgb, (0, 0, w, h))
+        self.stats["full_frame"] += 1
+
+    # Распознавание в области roi кадра img (RGB); точки пересчитываются в координаты всего кадра
+    def _infer(self, img, roi):
+        h, w = img.shape[:2]
+        x0, y0, x1, y1 = roi
+        crop = img[y0:y1, x0:x1]
+        ch, cw = crop.shape[:2]
+        scale = self.inferenceSize / max(cw, ch)
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, int(cw * scale)), max(1, int(ch * scale))), interpolation=cv2.INTER_AREA)
+        self.results = self.hands.process(np.ascontiguousarray(crop))
+        self.stats["inferences"] += 1
+        if not self.results.multi_hand_landmarks:
+            self.roi = None
+            self.lastBox = None
+            self.motion = float("inf")
+            return False
+        xs = []
+        ys = []
+        for handLms in self.results.multi_hand_landmarks:
+            for lm in handLms.landmark:
+                lm.x = (x0 + lm.x * cw) / w
+                lm.y = (y0 + lm.y * ch) / h
+                xs.append(lm.x * w)
+                ys.append(lm.y * h)
+        box = (min(xs), min(ys), max(xs), max(ys))
+        if self.lastBox:
+            self.motion = max(abs(a - b) for a, b in zip(box, self.lastBox))
+        self.lastBox = box
+        pad = max(20, self.roiPad * max(box[2] - box[0], box[3] - box[1]))
+        roi = (max(0, int(box[0] - pad)), max(0, int(box[1] - pad)),
+               min(w, int(box[2] + pad)), min(h, int(box[3] + pad)))
+        self.roi = roi if roi[2] - roi[0] > 1 and roi[3] - roi[1] > 1 else None
+        return True
+
+    def findPosition(self, img, handNo=0, draw=True):
+        xList = []
+        yList = []
+        bbox = []
+        self.lmList = []
+        if self.results.multi_hand_landmarks:
+            myHand = self.results.multi_hand_landmarks[handNo]
+            for id, lm in enumerate(myHand.landmark):
+                h, w, c = img.shape
+                cx, cy = int(lm.x * w), int(lm.y * h)
+                xList.append(cx)
+                yList.append(cy)
+                self.lmList.append([id, cx, cy])
+                if draw:
+                    cv2.circle(img, (cx, cy), 5, (255, 0, 255), cv2.FILLED)
+            xmin, xmax = min(xList), max(xList)
+            ymin, ymax = min(yList), max(yList)
+            bbox = xmin, ymin, xmax, ymax
+            if draw:
+                cv2.rectangle(img, (bbox[0] - 20, bbox[1] - 20), (bbox[2] + 20, bbox[3] + 20), (0, 255, 0), 2)
+        return self.lmList, bbox
+
+    # Все руки за один проход распознавания: (x запястья в зеркальном превью 0..1,
+    # метка MediaPipe "Left"/"Right", lmList, fingersUp()); self.lmList - первая рука
+    def findAllPositions(self, img, draw=True):
+        hands = []
+        landmarks = self.results.multi_hand_landmarks or []
+        handedness = getattr(self.results, "multi_handedness", None) or []
+        for handNo, handLms in enumerate(landmarks):
+            lmList, bbox = self.findPosition(img, handNo, draw)
+            label = handedness[handNo].classification[0].label if handNo < len(handedness) else ""
+            hands.append((1 - handLms.landmark[0].x, label, lmList, self.fingersUp()))
+        self.lmList = hands[0][2] if hands else []
+        return hands
+
+    def fingersUp(self):
+        fingers = []
+        if not self.lmList:
+            return [0] * 5
+        if self.lmList[self.tipIds[0]][1] < self.lmList[self.tipIds[0] - 1][1]:
+            fingers.append(1)
+        else:
+            fingers.append(0)
+        for id in range(1, 5):
+            if self.lmList[self.tipIds[id]][2] < self.lmList[self.tipIds[id] - 2][2]:
+                fingers.append(1)
+            else:
+                fingers.append(0)
+        return fingers
+
+# Руки по игрокам: для каждого игрока (lmList, fingers) или None.
+# Один игрок - первая найденная рука, как раньше. Двое - по стороне зеркального
+# превью: одна рука достаётся игроку своей половины, из двух левая - первому.
+# Если запястья почти на одной вертикали (ближе 10% ширины), порядок по x
+# ненадёжен, и руки делятся по метке MediaPipe: "Left" - первому игроку.
+def assign_players(hands, players):
+    if players == 1:
+        return [hands[0][2:] if hands else None]
+    if len(hands) >= 2:
+        a, b = sorted(hands[:2], key=lambda hand: hand[0])
+        if b[0] - a[0] < 0.1 and a[1] != b[1] and b[1] == "Left":
+            a, b = b, a
+        return [a[2:], b[2:]]
+    result = [None, None]
+    if hands:
+        result[0 if hands[0][0] < 0.5 else 1] = hands[0][2:]
+    return result
+
+# Жест по поднятым пальцам: указательный - влево, мизинец - вправо, оба - поворот
+def gesture_from_fingers(fingers):
+    if fingers[1] == 1 and fingers[4] == 0:
+        return "left"
+    if fingers[1] == 0 and fingers[4] == 1:
+        return "right"
+    if fingers[1] == 1 and fingers[4] == 1:
+        return "rotate"
+    return None
+
+# Ограничение частоты жестов по времени вместо time.sleep:
+# новый жест проходит сразу, удерживаемый повторяется раз в interval секунд
+# (жесты из once не повторяются)
+class GestureLimiter:
+    def __init__(self, interval, once=()):
+        self.interval = interval
+        self.once = once
+        self.last = None
+        self.last_time = 0.0
+
+    def update(self, gesture, now):
+        if gesture is None:
+            self.last = None
+            return None
+        if gesture != self.last or (gesture not in self.once and now - self.last_time >= self.interval):
+            self.last = gesture
+            self.last_time = now
+            return gesture
+        return None
+
+# Жесты по поднятым пальцам (fingersUp). Распознаватель жестов для
+# CameraWorker/ProcessCameraWorker: update(lmList, fingers, now) -> жест или None;
+# обученный классификатор - gestures.GestureRecognizer.
+class FingerRecognizer:
+    def __init__(self, interval=0.15):
+        self.limiter = GestureLimiter(interval)
+
+    def update(self, lmList, fingers, now):
+        return self.limiter.update(gesture_from_fingers(fingers) if lmList else None, now)
+
+# Фоновая обработка камеры: поток захвата держит только последний кадр,
+# поток распознавания берёт самый свежий кадр (устаревшие пропускаются)
+# и публикует жесты в очередь. Игровой цикл забирает их без ожидания.
+# latest() отдаёт RGB-кадр с точками; буферов два, по очереди, поэтому
+# кадр, отданный для превью, не перезаписывается следующим распознаванием.
+# Жесты - пары (номер игрока, жест); игроков players (1 или 2), руки делит
+# assign_players, у каждого игрока свой распознаватель из make_recognizer().
+class CameraWorker:
+    def __init__(self, detector, capture, gesture_interval=0.15, make_recognizer=None):
+        self.detector = detector
+        self.capture = capture
+        self.events = queue.Queue()
+        self.frame = None
+        self.lmList = []
+        self.frames_captured = 0
+        self.frames_processed = 0
+        # Время последнего capture.read(), мс
+        self.capture_time = 0.0
+        self._raw = None
+        self._raw_id = 0
+        self._rgb = [None, None]
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self.players = 1
+        make_recognizer = make_recognizer or (lambda: FingerRecognizer(gesture_interval))
+        self._recognizers = [make_recognizer(), make_recognizer()]
+        self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                         threading.Thread(target=self._inference_loop, daemon=True)]
+
+    def start(self):
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._running.set()
+        with self._new_frame:
+            self._new_frame.notify_all()
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=1.0)
+        self.capture.release()
+
+    # Приостановка: захват и распознавание ждут resume(), камера остаётся открытой.
+    # Жесты, накопленные до паузы, отбрасываются.
+    def pause(self):
+        self._running.clear()
+        self.events = queue.Queue()
+
+    def resume(self):
+        self._running.set()
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            if not self._running.wait(0.1):
+                continue
+            start = time.perf_counter()
+            success, img = self.capture.read()
+            self.capture_time = (time.perf_counter() - start) * 1000
+            if not success:
+                time.sleep(0.01)
+                continue
+            with self._new_frame:
+                self._raw = img
+                self._raw_id += 1
+                self.frames_captured += 1
+                self._new_frame.notify()
+
+    def _inference_loop(self):
+        seen_id = 0
+        while not self._stop.is_set():
+            with self._new_frame:
+                while self._raw_id == seen_id and not self._stop.is_set():
+                    self._new_frame.wait(0.1)
+                if self._stop.is_set():
+                    return
+                img, seen_id = self._raw, self._raw_id
+            buffer = self.frames_processed % 2
+            self.detector.rgb = self._rgb[buffer]
+            self.detector.findHands(img, draw=True)
+            self._rgb[buffer] = rgb = self.detector.rgb
+            hands = self.detector.findAllPositions(rgb, draw=True)
+            now = time.monotonic()
+            for player, hand in enumerate(assign_players(hands, self.players)):
+                lmList, fingers = hand or ([], [0] * 5)
+                gesture = self._recognizers[player].update(lmList, fingers, now)
+                if gesture:
+                    self.events.put((player, gesture))
+            lmList = self.detector.lmList
+            with self._lock:
+                self.frame = rgb
+                self.lmList = lmList
+                self.frames_processed += 1
+
+    @property
+    def inference_time(self):
+        return self.detector.inferenceTime
+
+    @property
+    def stats(self):
+        return self.detector.stats
+
+    def gestures(self):
+        while True:
+            try:
+                yield self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def latest(self):
+        with self._lock:
+            return self.frame, self.lmList
+
+# Камера и MediaPipe в отдельном процессе. RGB-кадры с точками пишутся в кольцевой
+# буфер в разделяемой памяти (без pickle), обратно приходят только номер слота
+# и найденные руки (точки и fingersUp()). Превью читается прямо из буфера.
+# Руки делятся между игроками и жесты распознаются в игровом процессе.
+class ProcessCameraWorker:
+    def __init__(self, index=0, frame_size=(320, 240), slots=4, gesture_interval=0.15, startup_timeout=15.0, adaptive=False,
+                 make_recognizer=None):
+        width, height = frame_size
+        self.index = index
+        self.shape = (slots, height, width, 3)
+        self.startup_timeout = startup_timeout
+        self.frames_processed = 0
+        self.inference_time = 0.0
+        self.capture_time = 0.0
+        self.stats = {}
+        self._shm = shared_memory.SharedMemory(create=True, size=int(np.prod(self.shape)))
+        self._frames = np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf)
+        self._results = multiprocessing.Queue(maxsize=64)
+        self._stop = multiprocessing.Event()
+        self._running = multiprocessing.Event()
+        self._running.set()
+        self._process = multiprocessing.Process(
+            target=_camera_process,
+            args=(self._shm.name, self.shape, index, self._results, self._stop, self._running, adaptive),
+            daemon=True)
+        self.players = 1
+        make_recognizer = make_recognizer or (lambda: FingerRecognizer(gesture_interval))
+        self._recognizers = [make_recognizer(), make_recognizer()]
+        self._events = []
+        self._slot = None
+        self.lmList = []
+
+    def start(self):
+        self._process.start()
+        try:
+            message = self._results.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            message = ("error", "timeout")
+        if message[0] != "ready":
+            self.stop()
+            raise RuntimeError("camera process failed: %s" % (message[1],))
+
+    def stop(self):
+        self._stop.set()
+        self._running.set()
+        self._process.join(timeout=2.0)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._frames = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def pause(self):
+        self._running.clear()
+        self._drain()
+        self._events = []
+
+    def resume(self):
+        self._running.set()
+
+    def _drain(self):
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if message[0] != "frame":
+                continue
+            _, self._slot, hands, timestamp, self.capture_time, self.inference_time, self.stats = message
+            self.frames_processed += 1
+            self.lmList = hands[0][2] if hands else []
+            for player, hand in enumerate(assign_players(hands, self.players)):
+                lmList, fingers = hand or ([], [0] * 5)
+                gesture = self._recognizers[player].update(lmList, fingers, timestamp)
+                if gesture:
+                    self._events.append((player, gesture))
+
+    def gestures(self):
+        self._drain()
+        events, self._events = self._events, []
+        return events
+
+    def latest(self):
+        self._drain()
+        if self._slot is None or self._frames is None:
+            return None, []
+        return self._frames[self._slot], self.lmList
+
+def _camera_process(shm_name, shape, index, results, stop, running, adaptive):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    capture = None
+    try:
+        capture = cv2.VideoCapture(index)
+        if not capture.isOpened():
+            results.put(("error", "camera %d is not available" % index))
+            return
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, shape[2])
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, shape[1])
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        _camera_loop(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf), capture, results, stop, running, adaptive)
+    except Exception as e:
+        results.put(("error", repr(e)))
+    finally:
+        if capture is not None:
+            capture.release()
+        results.cancel_join_thread()
+        shm.close()
+
+def _camera_loop(frames, capture, results, stop, running, adaptive):
+    detector = HandDetector(adaptive=adaptive)
+    results.put(("ready", None))
+    slots, height, width, _ = frames.shape
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    seq = 0
+    while not stop.is_set():
+        if not running.wait(0.1):
+            continue
+        start = time.perf_counter()
+        success, img = capture.read(frame)
+        capture_time = (time.perf_counter() - start) * 1000
+        if not success:
+            time.sleep(0.01)
+            continue
+        if not np.shares_memory(img, frame):
+            cv2.resize(img, (width, height), dst=frame)
+        # RGB-кадр пишется сразу в слот общей памяти
+        detector.rgb = frames[seq % slots]
+        detector.findHands(frame, draw=True)
+        hands = detector.findAllPositions(detector.rgb, draw=True)
+        try:
+            results.put_nowait(("frame", seq % slots, hands, time.monotonic(),
+                                capture_time, detector.inferenceTime, dict(detector.stats)))
+        except queue.Full:
+            pass
+        seq += 1
+
+# Запуск обработки камеры: в отдельном процессе или, при ошибке, в потоках.
+# frame_size - запрашиваемое разрешение камеры (по умолчанию размер превью),
+# make_recognizer - создание распознавателя жестов для игрока (по умолчанию по пальцам)
+def open_camera(index=0, use_process=False, adaptive=False, frame_size=(320, 240), make_recognizer=None):
+    if cv2 is None or mp is None:
+        raise missing_dependency
+    if use_process:
+        worker = ProcessCameraWorker(index, frame_size=frame_size, adaptive=adaptive, make_recognizer=make_recognizer)
+        try:
+            worker.start()
+            return worker
+        except RuntimeError as e:
+            print(e)
+    capture = cv2.VideoCapture(index)
+    capture.set(cv2.CAP_PROP_FRAME_WIDTH, frame_size[0])
+    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, frame_size[1])
+    worker = CameraWorker(HandDetector(adaptive=adaptive), capture, make_recognizer=make_recognizer)
+    worker.start()
+    return worker